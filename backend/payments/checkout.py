@@ -0,0 +1,133 @@
+"""
+Atomic Multi-item Checkout
+Validates price tolerance and stock for a whole cart and consumes the stock
+in one server-side script, so concurrent decay ticks never abort a checkout
+
+Items are charged the current price. A price at or below the one the client
+saw always passes (decay only makes it cheaper); a rise is accepted up to
+PRICE_TOLERANCE, relative to the price seen.
+"""
+
+from django.conf import settings
+
+from physics.state import price_key, stock_key
+
+PRICE_TOLERANCE = getattr(settings, 'CHECKOUT_PRICE_TOLERANCE', 0.01) # Max rise, as a fraction of the seen price
+MAX_ITEMS = getattr(settings, 'CHECKOUT_MAX_ITEMS', 50)
+
+# Per-item statuses
+CAPTURED = 'captured'
+OUT_OF_STOCK = 'out_of_stock'
+PRICE_MOVED = 'price_moved'
+UNKNOWN_PRODUCT = 'unknown_product'
+NOT_ATTEMPTED = 'not_attempted' # Valid, but another item failed (all-or-nothing)
+
+# Checkout script.
+#   KEYS: price, stock per item
+#   ARGV: tolerance, then expected price, quantity per item
+# Phase 1 validates every item, phase 2 only runs when all of them passed.
+# Redis runs the script atomically, so nothing can interleave between the
+# checks and the decrements (no WATCH, no optimistic aborts).
+# Returns {status, price, stock} per item; numbers as strings (Lua -> Redis
+# conversion would truncate floats).
+CHECKOUT_SCRIPT = """
+local tolerance = tonumber(ARGV[1])
+local n = #KEYS / 2
+local result = {}
+local ok = true
+
+for i = 1, n do
+    local price = redis.call('GET', KEYS[i * 2 - 1])
+    local stock = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    local expected = tonumber(ARGV[i * 2])
+    local quantity = tonumber(ARGV[i * 2 + 1])
+    local status = 'captured'
+
+    if not price then
+        status = 'unknown_product'
+        price = '0'
+    elseif stock < quantity then
+        status = 'out_of_stock'
+    elseif tonumber(price) > expected * (1 + tolerance) then
+        status = 'price_moved'
+    end
+
+    if status ~= 'captured' then
+        ok = false
+    end
+    result[i] = {status, price, tostring(stock)}
+end
+
+for i = 1, n do
+    if ok then
+        local quantity = tonumber(ARGV[i * 2 + 1])
+        result[i][3] = tostring(redis.call('DECRBY', KEYS[i * 2], quantity))
+    elseif result[i][1] == 'captured' then
+        result[i][1] = 'not_attempted'
+    end
+end
+
+return result
+"""
+
+
+class CheckoutError(ValueError):
+    """Malformed cart (rejected before touching Redis)."""
+
+
+def normalize_cart(items):
+    """
+    Validates the request cart and merges duplicate lines.
+    items: [{'product_id', 'price', 'quantity'?}, ...]
+    Returns [(product_id, price, quantity)] in first-seen order.
+    """
+    if not isinstance(items, list) or not items:
+        raise CheckoutError("Cart is empty.")
+    if len(items) > MAX_ITEMS:
+        raise CheckoutError(f"Cart exceeds {MAX_ITEMS} items.")
+
+    cart = {}
+    for item in items:
+        try:
+            product_id = str(item['product_id'])
+            price = float(item['price'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError("Every item needs a product_id and a price.")
+        if quantity <= 0:
+            raise CheckoutError(f"Invalid quantity for {product_id}.")
+
+        if product_id in cart:
+            cart[product_id][1] += quantity
+        else:
+            cart[product_id] = [price, quantity]
+
+    return [(pid, price, quantity) for pid, (price, quantity) in cart.items()]
+
+
+class CheckoutEngine:
+    """Runs CHECKOUT_SCRIPT for a normalized cart (one round trip per checkout)."""
+
+    def __init__(self, r, tolerance=PRICE_TOLERANCE):
+        self.tolerance = tolerance
+        self.script = r.register_script(CHECKOUT_SCRIPT)
+
+    def checkout(self, cart):
+        """Returns (captured, items) where items holds one result per cart line."""
+        keys, args = [], [self.tolerance]
+        for product_id, price, quantity in cart:
+            keys += [price_key(product_id), stock_key(product_id)]
+            args += [price, quantity]
+
+        replies = self.script(keys=keys, args=args)
+
+        items = []
+        for (product_id, price, quantity), (item_status, current_price, stock) in zip(cart, replies):
+            items.append({
+                'product_id': product_id,
+                'quantity': quantity,
+                'status': item_status.decode(),
+                'price': float(current_price),
+                'remaining_stock': int(stock),
+            })
+        return all(item['status'] == CAPTURED for item in items), items
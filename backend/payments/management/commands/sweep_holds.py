@@ -0,0 +1,37 @@
+import time
+import redis
+from django.core.management.base import BaseCommand
+from payments.reservations import ReservationStore, SWEEP_BATCH
+
+
+class Command(BaseCommand):
+    help = 'Returns expired checkout reservations to stock in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds between sweeps')
+        parser.add_argument('--batch', type=int, default=SWEEP_BATCH, help='Max holds restored per script call')
+        parser.add_argument('--once', action='store_true', help='Sweep everything expired once and exit')
+
+    def handle(self, *args, **options):
+        r = redis.Redis(host='localhost', port=6379, db=0)
+        store = ReservationStore(r)
+        batch = options['batch']
+
+        if not options['once']:
+            self.stdout.write(self.style.SUCCESS(f"Sweeping expired holds every {options['interval']}s"))
+
+        try:
+            while True:
+                # Keep going while full batches come back (backlog after downtime)
+                holds = batch
+                while holds == batch:
+                    holds, units = store.sweep(batch)
+                    if holds:
+                        self.stdout.write(f"Released {holds} expired hold(s), {units} unit(s) back to stock")
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Hold sweeper stopped."))
@@ -0,0 +1,186 @@
+"""
+Checkout Window Stock Reservations
+The Hyperdrive click takes a short TTL hold on the cart's units; confirm turns
+the hold into a sale and the sweeper returns expired holds to stock in bulk
+"""
+
+import secrets
+
+from django.conf import settings
+
+from physics.state import price_key, stock_key
+from .checkout import PRICE_TOLERANCE, CAPTURED
+
+HOLD_TTL_MS = getattr(settings, 'CHECKOUT_HOLD_TTL_MS', 5000) # Warp window + payment round trip
+SWEEP_BATCH = 500
+
+HOLD_PREFIX = "sc:hold:" # No TTL: a hold lives until confirmed or swept, however late the sweeper runs
+EXPIRY_KEY = "sc:holds:expiry" # token -> expiry (ms, Redis clock); the only place expiry is kept
+
+# Statuses on top of the checkout ones
+HELD = 'held'
+EXPIRED = 'expired'
+
+_NOW_MS = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+"""
+
+# Reserve script.
+#   KEYS: hold, expiry zset, then price, stock per item
+#   ARGV: token, ttl_ms, tolerance, then product_id, expected price, quantity per item
+# Same all-or-nothing validation as CHECKOUT_SCRIPT, but the units move into
+# the hold instead of being sold (items come back 'held').
+RESERVE_SCRIPT = _NOW_MS + """
+local ttl = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local n = (#KEYS - 2) / 2
+local result = {}
+local ok = true
+
+for i = 1, n do
+    local price = redis.call('GET', KEYS[i * 2 + 1])
+    local stock = tonumber(redis.call('GET', KEYS[i * 2 + 2]) or '0')
+    local expected = tonumber(ARGV[i * 3 + 2])
+    local quantity = tonumber(ARGV[i * 3 + 3])
+    local status = 'held'
+
+    if not price then
+        status = 'unknown_product'
+        price = '0'
+    elseif stock < quantity then
+        status = 'out_of_stock'
+    elseif tonumber(price) > expected * (1 + tolerance) then
+        status = 'price_moved'
+    end
+
+    if status ~= 'held' then
+        ok = false
+    end
+    result[i] = {status, price, tostring(stock)}
+end
+
+for i = 1, n do
+    if ok then
+        local product_id = ARGV[i * 3 + 1]
+        local quantity = ARGV[i * 3 + 3]
+        result[i][3] = tostring(redis.call('DECRBY', KEYS[i * 2 + 2], quantity))
+        redis.call('HSET', KEYS[1], 'q:' .. product_id, quantity, 'p:' .. product_id, result[i][2])
+    elseif result[i][1] == 'held' then
+        result[i][1] = 'not_attempted'
+    end
+end
+
+if ok then
+    redis.call('ZADD', KEYS[2], now + ttl, ARGV[1])
+end
+return {tostring(now + ttl), result}
+"""
+
+# Confirm script.
+#   KEYS: hold, expiry zset
+#   ARGV: token
+# Consumes a live hold (the stock was already taken by RESERVE_SCRIPT).
+# Returns the hold fields, or an empty list if it expired / never existed.
+CONFIRM_SCRIPT = _NOW_MS + """
+local expires = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if not expires or tonumber(expires) < now then
+    return {}
+end
+local fields = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return fields
+"""
+
+# Sweep script.
+#   KEYS: expiry zset
+#   ARGV: limit, hold prefix, stock prefix
+# Restores up to `limit` expired holds to stock in one atomic step.
+# Stock keys are derived from the hold fields, so this assumes a single
+# (non-cluster) Redis like the rest of the pulse path.
+SWEEP_SCRIPT = _NOW_MS + """
+local tokens = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+local units = 0
+for _, token in ipairs(tokens) do
+    local hold = ARGV[2] .. token
+    local fields = redis.call('HGETALL', hold)
+    for i = 1, #fields, 2 do
+        if string.sub(fields[i], 1, 2) == 'q:' then
+            local quantity = tonumber(fields[i + 1])
+            redis.call('INCRBY', ARGV[3] .. string.sub(fields[i], 3), quantity)
+            units = units + quantity
+        end
+    end
+    redis.call('DEL', hold)
+    redis.call('ZREM', KEYS[1], token)
+end
+return {#tokens, units}
+"""
+
+
+def hold_key(token):
+    return f"{HOLD_PREFIX}{token}"
+
+
+class ReservationStore:
+    """Reserve / confirm / sweep, each a single script call."""
+
+    def __init__(self, r, ttl_ms=HOLD_TTL_MS, tolerance=PRICE_TOLERANCE):
+        self.ttl_ms = ttl_ms
+        self.tolerance = tolerance
+        self.reserve_script = r.register_script(RESERVE_SCRIPT)
+        self.confirm_script = r.register_script(CONFIRM_SCRIPT)
+        self.sweep_script = r.register_script(SWEEP_SCRIPT)
+
+    def reserve(self, cart):
+        """
+        Holds every unit of a normalized cart, or nothing.
+        Returns (token, expires_at_ms, items); token is None when any item failed.
+        """
+        token = secrets.token_urlsafe(16)
+        keys = [hold_key(token), EXPIRY_KEY]
+        args = [token, self.ttl_ms, self.tolerance]
+        for product_id, price, quantity in cart:
+            keys += [price_key(product_id), stock_key(product_id)]
+            args += [product_id, price, quantity]
+
+        expires_at, replies = self.reserve_script(keys=keys, args=args)
+
+        items = []
+        for (product_id, price, quantity), (item_status, current_price, stock) in zip(cart, replies):
+            items.append({
+                'product_id': product_id,
+                'quantity': quantity,
+                'status': item_status.decode(),
+                'price': float(current_price),
+                'remaining_stock': int(stock),
+            })
+        if not all(item['status'] == HELD for item in items):
+            return None, None, items
+        return token, int(expires_at), items
+
+    def confirm(self, token):
+        """
+        Converts a live hold into a sale.
+        Returns the held items, or None if the hold expired or is unknown.
+        """
+        fields = self.confirm_script(keys=[hold_key(token), EXPIRY_KEY], args=[token])
+        if not fields:
+            return None
+
+        hold = {k.decode(): v.decode() for k, v in zip(fields[::2], fields[1::2])}
+        return [
+            {
+                'product_id': name[2:],
+                'quantity': int(quantity),
+                'status': CAPTURED,
+                'price': float(hold['p:' + name[2:]]),
+            }
+            for name, quantity in hold.items() if name.startswith('q:')
+        ]
+
+    def sweep(self, limit=SWEEP_BATCH):
+        """Returns (holds, units) restored to stock from expired holds."""
+        holds, units = self.sweep_script(keys=[EXPIRY_KEY], args=[limit, HOLD_PREFIX, stock_key('')])
+        return int(holds), int(units)
@@ -0,0 +1,69 @@
+import unittest
+
+from django.test import SimpleTestCase
+
+from payments.checkout import (
+    CAPTURED, NOT_ATTEMPTED, OUT_OF_STOCK, PRICE_MOVED, UNKNOWN_PRODUCT, CheckoutEngine,
+)
+from physics.state import price_key, stock_key
+
+try:
+    import fakeredis
+except ImportError: # Scripted Redis tests need fakeredis (with lupa for Lua)
+    fakeredis = None
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class CheckoutOutcomeTests(SimpleTestCase):
+    """CHECKOUT_SCRIPT outcomes: all-or-nothing, charged at the current price."""
+
+    def setUp(self):
+        self.r = fakeredis.FakeRedis()
+        self.engine = CheckoutEngine(self.r, tolerance=0.01)
+        self.stock('nebula', price=100.0, stock=5)
+        self.stock('quasar', price=20.0, stock=1)
+
+    def stock(self, product_id, price, stock):
+        self.r.set(price_key(product_id), price)
+        self.r.set(stock_key(product_id), stock)
+
+    def remaining(self, product_id):
+        return int(self.r.get(stock_key(product_id)))
+
+    def test_captured_at_the_seen_price(self):
+        captured, items = self.engine.checkout([('nebula', 100.0, 2), ('quasar', 20.0, 1)])
+        self.assertTrue(captured)
+        self.assertEqual([item['status'] for item in items], [CAPTURED, CAPTURED])
+        self.assertEqual(self.remaining('nebula'), 3)
+        self.assertEqual(items[0]['remaining_stock'], 3)
+
+    def test_price_drop_is_charged_at_the_current_price(self):
+        self.stock('nebula', price=92.5, stock=5)
+        captured, items = self.engine.checkout([('nebula', 100.0, 1)])
+        self.assertTrue(captured)
+        self.assertEqual(items[0]['price'], 92.5)
+
+    def test_small_rise_within_tolerance_is_accepted(self):
+        self.stock('nebula', price=100.9, stock=5)
+        captured, items = self.engine.checkout([('nebula', 100.0, 1)])
+        self.assertTrue(captured)
+        self.assertEqual(items[0]['price'], 100.9)
+
+    def test_rise_beyond_tolerance_is_rejected(self):
+        self.stock('nebula', price=101.5, stock=5)
+        captured, items = self.engine.checkout([('nebula', 100.0, 1)])
+        self.assertFalse(captured)
+        self.assertEqual(items[0]['status'], PRICE_MOVED)
+        self.assertEqual(self.remaining('nebula'), 5)
+
+    def test_out_of_stock_consumes_nothing(self):
+        captured, items = self.engine.checkout([('nebula', 100.0, 1), ('quasar', 20.0, 2)])
+        self.assertFalse(captured)
+        self.assertEqual([item['status'] for item in items], [NOT_ATTEMPTED, OUT_OF_STOCK])
+        self.assertEqual(self.remaining('nebula'), 5)
+        self.assertEqual(self.remaining('quasar'), 1)
+
+    def test_unknown_product(self):
+        captured, items = self.engine.checkout([('pulsar', 10.0, 1)])
+        self.assertFalse(captured)
+        self.assertEqual(items[0]['status'], UNKNOWN_PRODUCT)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import CreatePaymentIntentView, ConfirmPaymentView
+from .views import CreatePaymentIntentView, ConfirmPaymentView, ReserveStockView
 
 urlpatterns = [
     path('create-payment-intent/', CreatePaymentIntentView.as_view(), name='create-payment-intent'),
+    path('reserve/', ReserveStockView.as_view(), name='reserve-stock'),
     path('confirm/', ConfirmPaymentView.as_view(), name='confirm-payment'),
 ]
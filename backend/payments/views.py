@@ -5,6 +5,8 @@ import stripe
 from django.conf import settings
 import time
 import random
+from .checkout import CheckoutEngine, CheckoutError, normalize_cart, OUT_OF_STOCK, PRICE_MOVED, UNKNOWN_PRODUCT
+from .reservations import ReservationStore
 
 # Initialize Stripe
 stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', None)
@@ -35,75 +37,104 @@ class CreatePaymentIntentView(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class ReserveStockView(APIView):
+    def post(self, request):
+        """
+        Hyperdrive click: holds the cart's units for the 'Warp' window.
+        Returns a reservation token that ConfirmPaymentView turns into a sale.
+        """
+        import redis
+
+        try:
+            cart = normalize_cart(_cart_items(request.data))
+
+            r = redis.Redis(host='localhost', port=6379, db=0)
+            token, expires_at, results = ReservationStore(r).reserve(cart)
+
+            if token is None:
+                return Response({
+                    'error': _paradox_message(results),
+                    'items': results,
+                }, status=status.HTTP_409_CONFLICT)
+
+            return Response({
+                'reservation': token,
+                'expires_at': expires_at,
+                'items': results,
+            })
+
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
 class ConfirmPaymentView(APIView):
     def post(self, request):
         """
-        Executes the atomic checkout transaction using Redis WATCH.
+        Executes the atomic checkout for the whole cart in one Redis script.
         Ensures price stability and stock availability during the 'Warp' window.
+        With a `reservation` token the held units are captured instead;
+        otherwise accepts `items` ([{product_id, price, quantity}]) or the legacy single-item body.
         """
         import redis
-        
+
         try:
             data = request.data
             client_secret = data.get('clientSecret')
-            client_price = data.get('price')
             client_ts = data.get('timestamp') # When the user clicked
-            product_id = "pro_001_nebula" # Hardcoded for this prototype
-            
-            # Simulate processing time (Part of the 800ms window)
-            # time.sleep(0.3) 
-            
+
+            # Paradox Check: Forced Error (for testing)
+            if data.get('force_paradox'):
+                raise Exception("PARADOX: Simulated timeline fracture.")
+
             r = redis.Redis(host='localhost', port=6379, db=0)
-            price_key = f"sc:prod:price:{product_id}"
-            stock_key = f"sc:prod:stock:{product_id}"
-            
-            # Redis Atomic Transaction (WATCH)
-            pipe = r.pipeline()
-            
-            try:
-                pipe.watch(price_key, stock_key)
-                
-                # Fetch current state
-                current_price_raw = pipe.get(price_key)
-                stock_raw = pipe.get(stock_key)
-                
-                current_price = float(current_price_raw) if current_price_raw else 100.0
-                current_stock = int(stock_raw) if stock_raw else 0
-                
-                # 1. Paradox Check: Out of Stock
-                if current_stock <= 0:
-                    pipe.unwatch()
-                    raise Exception("PARADOX: Singularity collapse. Product is out of stock.")
-                
-                # 2. Paradox Check: Price Deviation (Decayed further or changed)
-                # Allow a tiny float epsilon, but strict check as requested
-                if abs(current_price - float(client_price)) > 0.01:
-                     pipe.unwatch()
-                     raise Exception(f"PARADOX: Temporal slip detected. Price moved from {client_price} to {current_price}.")
-                
-                # 3. Paradox Check: Forced Error (for testing)
-                if data.get('force_paradox'):
-                    pipe.unwatch()
-                    raise Exception("PARADOX: Simulated timeline fracture.")
-                
-                # Execute Transaction
-                pipe.multi()
-                pipe.decr(stock_key)
-                # Verify mass/hits updates could happen here too, but decay engine handles them.
-                # We just consume stock.
-                pipe.execute()
-                
+
+            token = data.get('reservation')
+            if token:
+                results = ReservationStore(r).confirm(str(token))
+                if results is None:
+                    raise Exception("PARADOX: Warp window closed. The reservation expired.")
+                captured = True
+            else:
+                cart = normalize_cart(_cart_items(data))
+                captured, results = CheckoutEngine(r).checkout(cart)
+
+            if not captured:
                 return Response({
-                    'status': 'captured',
-                    'message': 'Hyperdrive jump successful. Stock decremented.',
-                    'final_price': current_price,
-                    'remaining_stock': current_stock - 1
-                })
-                
-            except redis.WatchError:
-                # Transaction failed due to concurrent modification
-                raise Exception("PARADOX: Interference detected. Another observer collapsed the waveform.")
-                
+                    'error': _paradox_message(results),
+                    'items': results,
+                }, status=status.HTTP_409_CONFLICT)
+
+            return Response({
+                'status': 'captured',
+                'message': 'Hyperdrive jump successful. Stock decremented.',
+                'items': results,
+                'final_price': round(sum(i['price'] * i['quantity'] for i in results), 2),
+                'remaining_stock': results[0].get('remaining_stock'),
+            })
+
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
              # Return error to trigger Red Screen in Frontend
              return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+
+def _cart_items(data):
+    """`items` from the body, or the legacy single-item flow."""
+    items = data.get('items')
+    if items is None:
+        items = [{'product_id': data.get('product_id', "pro_001_nebula"), 'price': data.get('price')}]
+    return items
+
+
+def _paradox_message(results):
+    """Frontend-facing error for the first item that failed the checkout."""
+    for item in results:
+        if item['status'] == OUT_OF_STOCK:
+            return f"PARADOX: Singularity collapse. {item['product_id']} is out of stock."
+        if item['status'] == PRICE_MOVED:
+            return f"PARADOX: Temporal slip detected. Price of {item['product_id']} moved to {item['price']}."
+        if item['status'] == UNKNOWN_PRODUCT:
+            return f"PARADOX: {item['product_id']} does not exist in this timeline."
+    return "PARADOX: Interference detected. Another observer collapsed the waveform."
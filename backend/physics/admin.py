@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Product
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('sku', 'name', 'msrp', 'floor_ratio', 'base_mass', 'max_stock', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('sku', 'name')
@@ -0,0 +1,140 @@
+"""
+Celestial Constants (God Mode)
+One versioned Redis record for every physics constant, cached in memory by
+each process and reloaded only when an invalidation message arrives
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+
+from .decay import INTERACTION_DECAY, MASS_PER_HIT, TEMPORAL_DECAY
+
+CONFIG_KEY = "sc:phys:config"
+CONFIG_CHANNEL = "sc:phys:config:changed" # Payload: the new version
+
+DEFAULTS = {
+    'gravity': 1.0,          # Gravity Well multiplier
+    'base_mass': 1.0,        # Multiplier on every product's catalog base mass
+    'mass_per_hit': MASS_PER_HIT,
+    'temporal_decay': TEMPORAL_DECAY,
+    'interaction_decay': INTERACTION_DECAY,
+}
+
+# Legacy single keys, still written for older readers
+LEGACY_KEYS = {'gravity': "sc:phys:gravity", 'base_mass': "sc:phys:base_mass"}
+
+# Update script.
+#   KEYS: config hash, legacy gravity, legacy base_mass
+#   ARGV: channel, then field, value pairs
+# Writes the fields, bumps the version and publishes it in one atomic step,
+# so a reader can never see a new version with old values.
+UPDATE_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    if ARGV[i] == 'gravity' then
+        redis.call('SET', KEYS[2], ARGV[i + 1])
+    elseif ARGV[i] == 'base_mass' then
+        redis.call('SET', KEYS[3], ARGV[i + 1])
+    end
+end
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('PUBLISH', ARGV[1], version)
+return version
+"""
+
+
+def update_config(r, **values):
+    """
+    Validates and stores changed constants. Returns the new version.
+    Raises ValueError for unknown names or non-numeric values.
+    """
+    args = [CONFIG_CHANNEL]
+    for name, value in values.items():
+        if name not in DEFAULTS:
+            raise ValueError(f"Unknown celestial constant: {name}")
+        args += [name, float(value)]
+
+    script = r.register_script(UPDATE_SCRIPT)
+    return script(keys=[CONFIG_KEY, LEGACY_KEYS['gravity'], LEGACY_KEYS['base_mass']], args=args)
+
+
+def _parse(raw):
+    """(version, values) from an HGETALL reply; missing fields use DEFAULTS."""
+    raw = {k.decode(): v for k, v in raw.items()}
+    values = dict(DEFAULTS)
+    for name in DEFAULTS:
+        if name in raw:
+            values[name] = float(raw[name])
+    return int(raw.get('version', 0)), values
+
+
+class ConfigCache:
+    """
+    In-memory copy of the constants for one process.
+    Readers use `values` / `version` (plain attribute reads, no I/O); a
+    watcher thread or task reloads them whenever CONFIG_CHANNEL fires, and
+    once on every (re)subscribe so a missed message is never permanent.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.values = dict(DEFAULTS)
+        self._thread = None
+        self._loops = weakref.WeakSet()
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def load(self, r):
+        self.version, self.values = _parse(r.hgetall(CONFIG_KEY))
+        return self.values
+
+    def watch(self, r):
+        """Starts the invalidation listener thread (sync processes such as the engines)."""
+        if self._thread is None:
+            self.load(r)
+            self._thread = threading.Thread(target=self._listen, args=(r,), name='celestial-config', daemon=True)
+            self._thread.start()
+
+    def _listen(self, r):
+        while True:
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(CONFIG_CHANNEL)
+                self.load(r)
+                for message in pubsub.listen():
+                    if int(message['data']) != self.version:
+                        self.load(r)
+            except Exception:
+                time.sleep(1.0) # Redis went away; resubscribe and reload
+            finally:
+                pubsub.close()
+
+    def ensure_async_watcher(self, r):
+        """Starts the asyncio listener once per event loop (ASGI workers)."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._loops:
+            self._loops.add(loop)
+            asyncio.ensure_future(self._listen_async(r))
+
+    async def _listen_async(self, r):
+        while True:
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CONFIG_CHANNEL)
+                self.version, self.values = _parse(await r.hgetall(CONFIG_KEY))
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None and int(message['data']) != self.version:
+                        self.version, self.values = _parse(await r.hgetall(CONFIG_KEY))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+
+config = ConfigCache()
@@ -3,10 +3,60 @@ WebSocket Consumer for Health Check
 Implements ping-pong protocol to verify real-time pulse
 """
 
+import asyncio
 import json
 import time
-import redis
+from urllib.parse import parse_qs
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
+from . import metrics
+from .config import config
+from .frames import frame_time, is_frame
+from .interactions import get_interaction_buffer
+from .loadshed import PULSE_PUBLISH_HZ, REFUSE, RETRY_AFTER_MS, get_load_monitor
+from .outbox import PulseOutbox
+from .pulse import pack_celestial
+from .redis_pool import get_async_redis
+from .shards import GLOBAL_GROUP, PULSE_SHARDS, all_shards, shard_for, shard_group
+from .world import keyframe_cache
+
+# Last-value-wins conflation costs a decode + re-encode per frame and client,
+# so it is opt-in (?conflate=1); by default frames are passed through as bytes
+PULSE_CONFLATION = getattr(settings, 'PULSE_CONFLATION', False)
+
+# Rate negotiation: clients declare ?hz= and/or ?tier= (or send a HELLO)
+CLIENT_TIERS = getattr(settings, 'PULSE_CLIENT_TIERS', {'low': 10, 'mid': 30, 'high': None})
+MIN_CLIENT_HZ = 1
+
+
+def _flag(params, name, default):
+    """Reads a boolean query parameter (0/false disable, anything else enables)."""
+    value = params.get(name, [None])[0]
+    if value is None:
+        return default
+    return value.lower() not in ('0', 'false', 'no')
+
+
+def _list(params, name):
+    """Reads a comma separated query parameter (?products=a,b or repeated keys)."""
+    values = [v for raw in params.get(name, []) for v in raw.split(',') if v]
+    return values or None
+
+
+def _client_rate(hz=None, tier=None):
+    """
+    Target Hz for a client, or None for full fidelity.
+    An explicit hz wins over the tier's default; unknown values are ignored.
+    """
+    rate = CLIENT_TIERS.get(tier)
+    try:
+        if hz is not None:
+            rate = max(MIN_CLIENT_HZ, float(hz))
+    except (TypeError, ValueError):
+        pass
+    if rate is None or rate >= PULSE_PUBLISH_HZ:
+        return None
+    return rate
 
 
 class HealthCheckConsumer(AsyncWebsocketConsumer):
@@ -74,53 +124,182 @@ class HealthCheckConsumer(AsyncWebsocketConsumer):
 class PulseConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for high-frequency binary price pulses
-    Subscribes to 'global_pulse' group
+    Subscribes to 'global_pulse' plus the pulse shard groups it is viewing
     Supports MessagePack (Binary) for the <10ms target
+
+    Subscription (query string or a SUBSCRIBE message):
+        products=a,b  only those products (joins the shards that own them)
+        shards=0,3    whole shards
+        neither       every shard
+
+    Rate (query string or a HELLO message):
+        hz=20         at most 20 frames per second
+        tier=low      the tier's default rate (low/mid/high)
     """
     
     async def connect(self):
         """
         Handle WebSocket connection
-        Verifies JWT (Simplified for MVP) and joins global_pulse group
+        Verifies JWT (Simplified for MVP) and joins the pulse groups
         """
         # JWT Handshake Simulation
         # In production, this would use a custom AuthMiddleware or decode query_params
         query_string = self.scope.get('query_string', b'').decode()
-        token = None
-        if 'token=' in query_string:
-            token = query_string.split('token=')[1]
+        params = parse_qs(query_string)
+        token = params.get('token', [None])[0]
             
         if token or True: # Force true for current development flow
-            self.group_name = "global_pulse"
-            
-            await self.channel_layer.group_add(
-                self.group_name,
-                self.channel_name
+            self.groups = set()
+            self.shards = set()
+            self.outbox = None
+            self.conflate = _flag(params, 'conflate', PULSE_CONFLATION)
+            self.rate = _client_rate(params.get('hz', [None])[0], params.get('tier', [None])[0])
+            self.load = get_load_monitor()
+
+            if self.load.tier >= REFUSE:
+                # Over capacity: tell the client when to come back (1013 = Try Again Later)
+                metrics.count('shed.refused')
+                await self.accept()
+                await self.send(text_data=json.dumps({'type': 'RETRY', 'after_ms': RETRY_AFTER_MS}))
+                await self.close(code=1013)
+                return
+
+            await self.subscribe(
+                products=_list(params, 'products'),
+                shards=_list(params, 'shards'),
             )
             
+            metrics.ensure_async_flusher(get_async_redis())
+            config.ensure_async_watcher(get_async_redis())
+
             # Enforce binary mode
             await self.accept()
+
+            # First paint: the subscribed world as the very first pulse messages
+            await self.send_world(self.shards)
+
+            # Late joiners start from the current God Mode constants
+            if config.version:
+                await self.send(bytes_data=pack_celestial(config['gravity'], config['base_mass']))
         else:
             await self.close()
         
     async def disconnect(self, close_code):
-        """Leave global_pulse group"""
-        if hasattr(self, 'group_name'):
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
+        """Leave the pulse groups (pending interactions stay with the worker's flush timer)"""
+        if getattr(self, 'groups', None):
+            await self.subscribe_groups(set())
+        if getattr(self, 'outbox', None) is not None:
+            self.outbox.close()
+
+    async def subscribe(self, products=None, shards=None):
+        """
+        Re-targets this client at a product subset or a set of shards.
+        Product filtering and downsampling need decoded frames, so they always
+        use the outbox. Returns the shards whose keyframes the client still
+        needs: the newly joined ones, or all of them for a product subset
+        (newly listed products may live in shards it already had) and whenever
+        the outbox comes or goes (the client switches between the outbox's
+        frames and the publishers', and knows neither's dictionaries yet).
+        """
+        if products:
+            products = set(products)
+            wanted = {shard_for(pid) for pid in products}
+        elif shards:
+            products = None
+            wanted = {int(s) for s in shards if str(s).isdigit() and int(s) < PULSE_SHARDS}
+        else:
+            products = None
+            wanted = set(all_shards())
+
+        switched = False
+        if self.conflate or products is not None or self.rate:
+            if self.outbox is None:
+                self.outbox = PulseOutbox(self.send_pulse, load=self.load, on_error=self.close)
+                switched = True
+            self.outbox.set_filter(products)
+            self.outbox.set_rate(self.rate)
+        elif self.outbox is not None:
+            self.outbox.close()
+            self.outbox = None
+            switched = True
+
+        await self.subscribe_groups({GLOBAL_GROUP} | {shard_group(s) for s in wanted})
+        added, self.shards = wanted - self.shards, wanted
+        return wanted if products is not None or switched else added
+
+    async def subscribe_groups(self, groups):
+        """Joins/leaves channel groups so this client is in exactly `groups`."""
+        added, removed = groups - self.groups, self.groups - groups
+        await asyncio.gather(
+            *(self.channel_layer.group_add(g, self.channel_name) for g in added),
+            *(self.channel_layer.group_discard(g, self.channel_name) for g in removed),
+        )
+        self.groups = groups
         
     async def pulse_message(self, event):
         """
         Receive message from group and send binary data to WebSocket
         """
         binary_data = event['data']
-        
-        # Send binary message (MessagePack)
-        # Binary format ensures <10ms propagation target
+        if 'ts' in event:
+            metrics.record('channel.hop', time.time() - event['ts'])
+
+        if self.outbox is not None:
+            # Conflated: only the newest state per product is kept until sent
+            self.outbox.push(binary_data)
+            return
+
+        # Pass-through: the worker's shared shed copy while it is overloaded
+        binary_data = self.load.shed(binary_data)
+        if binary_data is not None:
+            await self.send_pulse(binary_data)
+
+    async def pulse_batch(self, event):
+        """
+        Receive several frames coalesced by the bridge into one group message
+        """
+        if 'ts' in event:
+            metrics.record('channel.hop', time.time() - event['ts'])
+
+        for binary_data in event['frames']:
+            if self.outbox is not None:
+                self.outbox.push(binary_data)
+                continue
+            binary_data = self.load.shed(binary_data)
+            if binary_data is not None:
+                await self.send_pulse(binary_data)
+
+    async def send_world(self, shards):
+        """
+        Sends the bridge's mirrored keyframes of each shard (see physics.world).
+        Group messages are only handled once connect()/receive() returns, so
+        the keyframes always go out before any newer delta. Filtered or
+        conflated clients get them through the outbox, which applies the filter.
+        """
+        if not shards:
+            return
+        try:
+            keyframes = await keyframe_cache.get(get_async_redis(), shards)
+        except Exception:
+            return # No world yet (or Redis is slow): live frames fill it in
+        for binary_data in keyframes:
+            if self.outbox is not None:
+                self.outbox.push(binary_data)
+            else:
+                await self.send(bytes_data=binary_data)
+
+    async def send_pulse(self, binary_data):
+        """
+        Send binary message (MessagePack or pulse frame)
+        Binary format ensures <10ms propagation target
+        """
+        start = time.perf_counter()
         await self.send(bytes_data=binary_data)
 
+        metrics.record('consumer.send', time.perf_counter() - start)
+        if is_frame(binary_data):
+            metrics.record('pulse.e2e', time.time() - frame_time(binary_data))
+
     async def receive(self, text_data=None, bytes_data=None):
         """
         Handle incoming messages from the client.
@@ -129,16 +308,26 @@ class PulseConsumer(AsyncWebsocketConsumer):
         if text_data:
             try:
                 data = json.loads(text_data)
-                if data.get('type') == 'FLICK' or data.get('type') == 'COLLISION':
+                if data.get('type') == 'SUBSCRIBE':
+                    added = await self.subscribe(
+                        products=data.get('products'),
+                        shards=data.get('shards'),
+                    )
+                    await self.send_world(added)
+                elif data.get('type') == 'HELLO':
+                    self.rate = _client_rate(data.get('hz'), data.get('tier'))
+                    if self.rate and self.outbox is None:
+                        # Mid-stream: seed the new outbox's decoder with every publisher's state
+                        self.outbox = PulseOutbox(self.send_pulse, load=self.load, on_error=self.close)
+                        self.outbox.set_rate(self.rate)
+                        await self.send_world(self.shards)
+                    elif self.outbox is not None:
+                        self.outbox.set_rate(self.rate)
+                elif data.get('type') == 'FLICK' or data.get('type') == 'COLLISION':
                     product_id = data.get('product_id')
                     if product_id:
-                        # Interaction Heatmap: Use Sorted Set for real-time ranking
-                        r = redis.Redis(host='localhost', port=6379, db=0)
-                        r.zincrby("sc:prod:interactions", 1, product_id)
-                        
-                        # Fallback individual hit counter for backward compatibility
-                        r.incr(f"sc:prod:hits:{product_id}")
-                        r.expire(f"sc:prod:hits:{product_id}", 60)
+                        # Coalesced per worker; flushed to Redis in batches
+                        get_interaction_buffer().record(product_id)
             except Exception:
                 pass
 
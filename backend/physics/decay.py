@@ -0,0 +1,97 @@
+"""
+Vectorized Price Decay Kernel
+Computes one decay tick for the whole catalog in a single NumPy pass
+"""
+
+import numpy as np
+
+# Decay constants (per tick)
+TEMPORAL_DECAY = 0.01       # Flat price drop every tick
+INTERACTION_DECAY = 0.05    # Price drop per FLICK/COLLISION hit
+FLOOR_RATIO = 0.70          # Price never drops below 70% of MSRP
+MASS_PER_HIT = 0.2          # 0.2 unit of communal mass per hit
+MASS_RELAXATION = 0.05      # Fraction of excess mass shed every tick
+
+# [STORY 3.2] Threshold Escalation (stock % -> instability)
+INSTABILITY_TIERS = (
+    (5.0, 0.8),
+    (10.0, 0.5),
+    (20.0, 0.2),
+)
+
+
+class CatalogState:
+    """
+    Column-oriented hot state for every product the engine ticks.
+    Row i of every array belongs to product_ids[i].
+    """
+
+    def __init__(self, product_ids, msrp, max_stock, base_mass=1.0, floor_ratio=FLOOR_RATIO):
+        self.product_ids = list(product_ids)
+        n = len(self.product_ids)
+
+        self.msrp = np.broadcast_to(np.asarray(msrp, dtype=np.float64), (n,)).copy()
+        self.floor = self.msrp * floor_ratio
+        self.max_stock = np.broadcast_to(np.asarray(max_stock, dtype=np.int64), (n,)).copy()
+        self.base_mass = np.broadcast_to(np.asarray(base_mass, dtype=np.float64), (n,)).copy()
+
+        self.price = self.msrp.copy()
+        self.mass = self.base_mass.copy()
+        self.stock = self.max_stock.copy()
+        self.instability = np.zeros(n, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+
+def instability_for(stock, max_stock):
+    """
+    Maps stock levels onto the Redshift instability tiers.
+    The final unit always gets maximum instability (final desync).
+    """
+    stock_pct = stock * 100.0 / np.maximum(max_stock, 1)
+
+    conditions = [stock == 1] + [stock_pct <= pct for pct, _ in INSTABILITY_TIERS]
+    choices = [1.0] + [level for _, level in INSTABILITY_TIERS]
+    return np.select(conditions, choices, default=0.0)
+
+
+def decay_tick(state, hits, mass_per_hit=MASS_PER_HIT, temporal_decay=TEMPORAL_DECAY,
+               interaction_decay=INTERACTION_DECAY, base_mass_scale=1.0):
+    """
+    Advances every product by one tick in place.
+
+    hits: int array of interactions since the previous tick (one per row).
+    The constants default to the module values; the engine passes the live
+    celestial config (base_mass_scale multiplies every catalog base mass).
+    Returns (stock_delta, changed) where stock_delta is the number of units
+    consumed this tick and changed flags rows whose price or mass moved.
+    """
+    hits = np.asarray(hits, dtype=np.int64)
+    old_price = state.price.copy()
+    old_mass = state.mass.copy()
+
+    # 1. Temporal + Interaction Decay, clamped to the 70% floor
+    state.price = np.maximum(
+        state.price - (temporal_decay + hits * interaction_decay),
+        state.floor,
+    )
+
+    # 2. Communal Mass: grow with hits, then relax back towards base mass
+    base_mass = state.base_mass * base_mass_scale
+    mass = state.mass + hits * mass_per_hit
+    state.mass = np.maximum(base_mass, mass - (mass - base_mass) * MASS_RELAXATION)
+
+    # 3. Stock drains by one unit on every tick that saw interactions
+    stock_delta = np.where((hits > 0) & (state.stock > 0), 1, 0)
+    state.stock = state.stock - stock_delta
+
+    # 4. Instability (Redshift) tiers
+    state.instability = instability_for(state.stock, state.max_stock)
+
+    changed = (
+        (hits > 0)
+        | (np.abs(state.price - old_price) > 0.001)
+        | (np.abs(state.mass - old_mass) > 0.001)
+    )
+    return stock_delta, changed
@@ -0,0 +1,358 @@
+"""
+Binary Pulse Frames (v1)
+Packs every product that changed in a tick into one column-oriented message
+
+Layout (little-endian):
+    header   magic u8 (0xC1) | version u8 | flags u8 | nblocks u8
+             source u32 | seq u32 | t f64 | ndict u32
+    dict     ndict x (index u32 | len u8 | utf-8 product id)
+    blocks   nblocks x (field u8 | count u32 | index u32[count] | values[count x width])
+
+0xC1 is the one byte MessagePack never emits, so clients can tell frames
+apart from msgpack messages (e.g. CELESTIAL updates) by the first byte.
+Product IDs are interned per source: the dictionary carries only IDs new
+since the previous frame, while keyframes carry every ID and every field.
+Delta frames only carry the fields that changed since the previous frame.
+"""
+
+import random
+import struct
+import time
+
+import numpy as np
+
+MAGIC = 0xC1
+VERSION = 1
+FLAG_KEYFRAME = 0x01
+
+HEADER = struct.Struct('<BBBBIIdI')
+DICT_ENTRY = struct.Struct('<IB')
+BLOCK = struct.Struct('<BI')
+
+# (name, width, wire dtype) - the position in this tuple is the field id
+FIELDS = (
+    ('p', 1, '<f8'),     # Current Price
+    ('m', 1, '<f4'),     # Communal Mass
+    ('ins', 1, '<f4'),   # Instability (Redshift)
+    ('stk', 1, '<i4'),   # Current Stock Level
+    ('pos', 2, '<f4'),   # Position {x, y}
+    ('vel', 2, '<f4'),   # Velocity {x, y}
+    ('hits', 1, '<i4'),  # Interactions in the last tick
+)
+FIELD_IDS = {name: fid for fid, (name, _, _) in enumerate(FIELDS)}
+VECTOR_FIELDS = frozenset(name for name, width, _ in FIELDS if width == 2)
+
+
+def is_frame(data):
+    """True when the payload is a binary pulse frame rather than msgpack."""
+    return bool(data) and data[0] == MAGIC
+
+
+def frame_time(data):
+    """Server timestamp of a frame, read straight from the header."""
+    return HEADER.unpack_from(data, 0)[6]
+
+
+class _Column:
+    """Last value sent per interned product for one field."""
+
+    def __init__(self, width, dtype, capacity):
+        self.values = np.zeros((capacity, width), dtype=dtype)
+        self.known = np.zeros(capacity, dtype=bool)
+
+    def grow(self, capacity):
+        values = np.zeros((capacity,) + self.values.shape[1:], dtype=self.values.dtype)
+        values[:len(self.values)] = self.values
+        known = np.zeros(capacity, dtype=bool)
+        known[:len(self.known)] = self.known
+        self.values, self.known = values, known
+
+
+class FrameEncoder:
+    """
+    Stateful encoder for one publisher.
+    Remembers the last value sent per product and field to emit deltas,
+    and forces a full keyframe every `keyframe_every` seconds.
+    """
+
+    def __init__(self, keyframe_every=5.0, source=None):
+        self.keyframe_every = keyframe_every
+        self.source = random.getrandbits(32) if source is None else source
+        self.seq = 0
+        self._index = {}
+        self._ids = []
+        self._new = []
+        self._capacity = 64
+        self._columns = {
+            name: _Column(width, dtype, self._capacity) for name, width, dtype in FIELDS
+        }
+        self._last_keyframe = None
+
+    def intern(self, product_ids):
+        """Maps product IDs onto stable integer indices (new IDs are queued for the dict)."""
+        rows = np.empty(len(product_ids), dtype=np.uint32)
+        for i, pid in enumerate(product_ids):
+            idx = self._index.get(pid)
+            if idx is None:
+                idx = self._index[pid] = len(self._ids)
+                self._ids.append(pid)
+                self._new.append(idx)
+            rows[i] = idx
+
+        if len(self._ids) > self._capacity:
+            while self._capacity < len(self._ids):
+                self._capacity *= 2
+            for column in self._columns.values():
+                column.grow(self._capacity)
+        return rows
+
+    def encode(self, product_ids, columns, t=None):
+        """
+        Encodes one tick. `columns` maps field names to arrays aligned with
+        product_ids ((n, 2) for pos/vel). Fields may be omitted.
+        Returns the frame bytes, or None when nothing changed.
+        """
+        rows = self.intern(product_ids)
+        return self._encode({name: (rows, values) for name, values in columns.items()}, t)
+
+    def encode_updates(self, updates, t=None):
+        """
+        Encodes a sparse {product_id: {field: value}} map (the FrameDecoder output
+        shape) into one frame. Returns the frame bytes, or None when nothing changed.
+        """
+        by_field = {}
+        for pid, fields in updates.items():
+            for name, value in fields.items():
+                if name not in FIELD_IDS:
+                    continue
+                if name in VECTOR_FIELDS:
+                    value = (value['x'], value['y'])
+                ids, values = by_field.setdefault(name, ([], []))
+                ids.append(pid)
+                values.append(value)
+
+        field_rows = {
+            name: (self.intern(ids), values) for name, (ids, values) in by_field.items()
+        }
+        return self._encode(field_rows, t)
+
+    def _encode(self, field_rows, t):
+        t = time.time() if t is None else t
+        keyframe = self._last_keyframe is None or t - self._last_keyframe >= self.keyframe_every
+
+        blocks = []
+        for name, (rows, values) in field_rows.items():
+            _, width, dtype = FIELDS[FIELD_IDS[name]]
+            column = self._columns[name]
+            values = np.asarray(values, dtype=dtype).reshape(len(rows), width)
+
+            changed = ~column.known[rows] | np.any(column.values[rows] != values, axis=1)
+            column.values[rows] = values
+            column.known[rows] = True
+            if changed.any():
+                blocks.append((FIELD_IDS[name], rows[changed], values[changed]))
+
+        if keyframe:
+            self._last_keyframe = t
+            dict_rows = range(len(self._ids))
+            blocks = []
+            for fid, (name, _, _) in enumerate(FIELDS):
+                column = self._columns[name]
+                if column.known.any():
+                    rows = np.flatnonzero(column.known).astype(np.uint32)
+                    blocks.append((fid, rows, column.values[column.known]))
+        elif blocks or self._new:
+            dict_rows = self._new
+        else:
+            return None
+
+        self._new = []
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        return self._pack(keyframe, t, dict_rows, blocks)
+
+    def _pack(self, keyframe, t, dict_rows, blocks):
+        entries = [(idx, self._ids[idx]) for idx in dict_rows]
+        return pack_frame(self.source, self.seq, keyframe, t, entries, blocks)
+
+
+def pack_frame(source, seq, keyframe, t, entries, blocks):
+    """Serializes one frame: entries are (index, product id), blocks (field id, rows, values)."""
+    parts = []
+    for idx, pid in entries:
+        raw = pid.encode()[:255]
+        parts.append(DICT_ENTRY.pack(idx, len(raw)))
+        parts.append(raw)
+
+    for fid, rows, values in blocks:
+        parts.append(BLOCK.pack(fid, len(rows)))
+        parts.append(rows.astype('<u4').tobytes())
+        parts.append(values.tobytes())
+
+    flags = FLAG_KEYFRAME if keyframe else 0
+    header = HEADER.pack(MAGIC, VERSION, flags, len(blocks), source, seq, t, len(entries))
+    return header + b''.join(parts)
+
+
+def frame_source(data):
+    """Publisher (encoder) id of a frame, read straight from the header."""
+    return HEADER.unpack_from(data, 0)[4]
+
+
+def strip_fields(data, names):
+    """
+    Copy of a frame without the blocks of the given fields, cut straight out of
+    the bytes (source, seq and dictionary untouched, so client decoders stay in
+    step). Returns None when nothing but the header would be left.
+    """
+    magic, version, flags, nblocks, source, seq, t, ndict = HEADER.unpack_from(data, 0)
+    offset = HEADER.size
+    for _ in range(ndict):
+        _, length = DICT_ENTRY.unpack_from(data, offset)
+        offset += DICT_ENTRY.size + length
+
+    parts = [bytes(data[HEADER.size:offset])]
+    kept = 0
+    for _ in range(nblocks):
+        fid, count = BLOCK.unpack_from(data, offset)
+        name, width, dtype = FIELDS[fid]
+        end = offset + BLOCK.size + count * (4 + width * np.dtype(dtype).itemsize)
+        if name not in names:
+            parts.append(bytes(data[offset:end]))
+            kept += 1
+        offset = end
+
+    if not kept and not ndict:
+        return None
+    return HEADER.pack(magic, version, flags, kept, source, seq, t, ndict) + b''.join(parts)
+
+
+class FrameMirror:
+    """
+    Replica of one publisher's encoder state, rebuilt from the frames it sends.
+    keyframe() re-emits everything the publisher has sent so far as a keyframe
+    under the publisher's own source id, dictionary indices and latest seq, so
+    a client seeded with it decodes that publisher's following deltas as if it
+    had been listening all along.
+    A mirror is only usable once it has seen one of the publisher's keyframes.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.seq = 0
+        self.t = 0.0
+        self.synced = False
+        self.names = {}
+        self._capacity = 64
+        self._columns = {
+            name: _Column(width, dtype, self._capacity) for name, width, dtype in FIELDS
+        }
+
+    def apply(self, data):
+        magic, version, flags, nblocks, source, seq, t, ndict = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported pulse frame (magic={magic:#x}, version={version})")
+        if flags & FLAG_KEYFRAME:
+            self.synced = True
+        self.seq, self.t = seq, t
+
+        offset = HEADER.size
+        for _ in range(ndict):
+            idx, length = DICT_ENTRY.unpack_from(data, offset)
+            offset += DICT_ENTRY.size
+            self.names[idx] = bytes(data[offset:offset + length]).decode()
+            offset += length
+
+        for _ in range(nblocks):
+            fid, count = BLOCK.unpack_from(data, offset)
+            offset += BLOCK.size
+            name, width, dtype = FIELDS[fid]
+            rows = np.frombuffer(data, dtype='<u4', count=count, offset=offset)
+            offset += rows.nbytes
+            values = np.frombuffer(data, dtype=dtype, count=count * width, offset=offset)
+            offset += values.nbytes
+            if count:
+                self._reserve(int(rows.max()) + 1)
+                column = self._columns[name]
+                column.values[rows] = values.reshape(count, width)
+                column.known[rows] = True
+
+    def _reserve(self, size):
+        if size > self._capacity:
+            while self._capacity < size:
+                self._capacity *= 2
+            for column in self._columns.values():
+                column.grow(self._capacity)
+
+    def keyframe(self):
+        """The publisher's full current state as one keyframe (None until synced)."""
+        if not self.synced:
+            return None
+        named = np.zeros(self._capacity, dtype=bool)
+        named[np.fromiter((idx for idx in self.names if idx < self._capacity), dtype=np.intp)] = True
+
+        blocks = []
+        for fid, (name, _, _) in enumerate(FIELDS):
+            column = self._columns[name]
+            present = column.known & named
+            if present.any():
+                rows = np.flatnonzero(present).astype(np.uint32)
+                blocks.append((fid, rows, column.values[present]))
+        entries = sorted(self.names.items())
+        return pack_frame(self.source, self.seq, True, self.t, entries, blocks)
+
+
+class FrameDecoder:
+    """
+    Client-side counterpart of FrameEncoder (used by tooling and tests of the wire format).
+    Tracks each source's dictionary; entries for indices not yet seen are skipped
+    until the next keyframe.
+    """
+
+    def __init__(self):
+        self._dicts = {}
+
+    def decode(self, data):
+        """
+        Returns {'source', 'seq', 't', 'keyframe', 'updates'} where updates maps
+        product IDs to {field: value} with pos/vel as {'x', 'y'} like legacy pulses.
+        """
+        magic, version, flags, nblocks, source, seq, t, ndict = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported pulse frame (magic={magic:#x}, version={version})")
+
+        names = self._dicts.setdefault(source, {})
+        offset = HEADER.size
+        for _ in range(ndict):
+            idx, length = DICT_ENTRY.unpack_from(data, offset)
+            offset += DICT_ENTRY.size
+            names[idx] = bytes(data[offset:offset + length]).decode()
+            offset += length
+
+        updates = {}
+        for _ in range(nblocks):
+            fid, count = BLOCK.unpack_from(data, offset)
+            offset += BLOCK.size
+            name, width, dtype = FIELDS[fid]
+            rows = np.frombuffer(data, dtype='<u4', count=count, offset=offset)
+            offset += rows.nbytes
+            values = np.frombuffer(data, dtype=dtype, count=count * width, offset=offset)
+            offset += values.nbytes
+            values = values.reshape(count, width)
+
+            for idx, value in zip(rows.tolist(), values.tolist()):
+                pid = names.get(idx)
+                if pid is None:
+                    continue
+                if width == 2:
+                    value = {'x': value[0], 'y': value[1]}
+                else:
+                    value = value[0]
+                updates.setdefault(pid, {})[name] = value
+
+        return {
+            'source': source,
+            'seq': seq,
+            't': t,
+            'keyframe': bool(flags & FLAG_KEYFRAME),
+            'updates': updates,
+        }
@@ -0,0 +1,122 @@
+"""
+Sliding-window Interaction Heatmap
+Time-bucketed Count-Min Sketch plus a capped top-K per bucket, merged over
+the last 10s / 1m / 5m. Memory is fixed no matter how large the catalog is
+"""
+
+import time
+import zlib
+
+import numpy as np
+
+from .redis_pool import PipelineScript
+
+BUCKET_SECONDS = 5
+WINDOWS = {'10s': 10, '1m': 60, '5m': 300}
+DEFAULT_WINDOW = '1m'
+RETENTION_BUCKETS = max(WINDOWS.values()) // BUCKET_SECONDS + 1
+
+# Count-Min Sketch: DEPTH rows of WIDTH u32 counters in one Redis string per
+# bucket (BITFIELD), i.e. 32KB per bucket and ~2MB for the whole 5m window
+DEPTH = 4
+WIDTH = 2048
+TOP_CAPACITY = 64 # Candidates kept per bucket (the most K a query can ask for)
+
+SKETCH_KEY = "sc:heat:cms:{bucket}"
+TOP_KEY = "sc:heat:top:{bucket}"
+
+# Record script.
+#   KEYS: sketch, top zset (current bucket), optional batch marker
+#   ARGV: ttl_ms, capacity, depth, then per product: id, count, `depth` counter offsets
+# Skips batches whose marker is already set (a retried flush). Increments the
+# product's counter in every sketch row (saturating u32), then scores it in the
+# bucket's top-K with its new estimate (min over rows) and trims the top-K back
+# to capacity.
+RECORD_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+if KEYS[3] and not redis.call('SET', KEYS[3], 1, 'NX', 'PX', ttl) then
+    return 0
+end
+local capacity = tonumber(ARGV[2])
+local stride = tonumber(ARGV[3]) + 2
+
+for i = 4, #ARGV, stride do
+    local command = {'BITFIELD', KEYS[1], 'OVERFLOW', 'SAT'}
+    for j = i + 2, i + stride - 1 do
+        table.insert(command, 'INCRBY')
+        table.insert(command, 'u32')
+        table.insert(command, '#' .. ARGV[j])
+        table.insert(command, ARGV[i + 1])
+    end
+    local counters = redis.call(unpack(command))
+    local estimate = math.min(unpack(counters))
+    redis.call('ZADD', KEYS[2], estimate, ARGV[i])
+end
+
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(capacity + 1))
+redis.call('PEXPIRE', KEYS[1], ttl)
+redis.call('PEXPIRE', KEYS[2], ttl)
+return 1
+"""
+_record_script = PipelineScript(RECORD_SCRIPT) # Queued by SHA: the batch, not the source, goes over the wire
+
+
+def bucket_of(now=None):
+    return int((time.time() if now is None else now) // BUCKET_SECONDS)
+
+
+def columns_for(product_id):
+    """The product's counter column in each sketch row (stable across processes)."""
+    data = product_id.encode()
+    return [zlib.crc32(data, row * 0x9E3779B1 & 0xFFFFFFFF) % WIDTH for row in range(DEPTH)]
+
+
+def offsets_for(product_id):
+    """Counter index (in u32 units) of the product in every sketch row."""
+    return [row * WIDTH + column for row, column in enumerate(columns_for(product_id))]
+
+
+def queue_record(pipe, counts, now=None, marker=None):
+    """
+    Queues one script call adding a {product_id: count} batch (sync or async pipeline).
+    With a marker key the batch is applied at most once (retries are no-ops).
+    """
+    if not counts:
+        return
+    bucket = bucket_of(now)
+    keys = [SKETCH_KEY.format(bucket=bucket), TOP_KEY.format(bucket=bucket)]
+    if marker:
+        keys.append(marker)
+    args = [RETENTION_BUCKETS * BUCKET_SECONDS * 1000, TOP_CAPACITY, DEPTH]
+    for product_id, count in counts.items():
+        args += [product_id, int(count), *offsets_for(product_id)]
+    _record_script.queue(pipe, keys, args)
+
+
+def top(r, k=5, window=DEFAULT_WINDOW, now=None):
+    """
+    Heaviest products over the window: [(product_id, estimated hits)].
+    Candidates come from each bucket's top-K; counts from the merged sketch.
+    """
+    k = max(1, min(int(k), TOP_CAPACITY))
+    current = bucket_of(now)
+    buckets = range(current - WINDOWS[window] // BUCKET_SECONDS + 1, current + 1)
+
+    pipe = r.pipeline(transaction=False)
+    for bucket in buckets:
+        pipe.get(SKETCH_KEY.format(bucket=bucket))
+        pipe.zrange(TOP_KEY.format(bucket=bucket), 0, -1)
+    replies = pipe.execute()
+
+    size = DEPTH * WIDTH
+    merged = np.zeros(size, dtype=np.int64)
+    candidates = set()
+    for sketch, members in zip(replies[::2], replies[1::2]):
+        if sketch:
+            counters = np.frombuffer(sketch[:size * 4].ljust(size * 4, b'\0'), dtype='>u4')
+            merged += counters
+        candidates.update(m.decode() for m in members)
+
+    scored = [(pid, int(merged[offsets_for(pid)].min())) for pid in candidates]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:k]
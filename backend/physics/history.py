@@ -0,0 +1,115 @@
+"""
+Write-behind Price History
+Takes each tick's changed rows off the decay loop and bulk-inserts them
+into PriceSample from a background thread on a size/time trigger
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import metrics
+from .models import PriceSample, Product
+
+FLUSH_ROWS = getattr(settings, 'PULSE_HISTORY_FLUSH_ROWS', 5000)
+FLUSH_SECONDS = getattr(settings, 'PULSE_HISTORY_FLUSH_SECONDS', 2.0)
+MAX_PENDING_TICKS = getattr(settings, 'PULSE_HISTORY_MAX_PENDING_TICKS', 600) # ~2 min at 200ms
+LOOKUP_CHUNK = 500 # Keeps sku__in under the database parameter limit
+
+
+class HistoryWriter(threading.Thread):
+    """
+    Bounded in-memory buffer between the decay engine and the database.
+
+    record() only copies the changed rows and enqueues them (never blocks);
+    the writer thread groups ticks into one bulk_create once FLUSH_ROWS rows
+    are pending or FLUSH_SECONDS have passed. If the database falls behind
+    for longer than the queue holds, whole ticks are dropped and counted
+    instead of stalling the engine (lost_ticks).
+    """
+
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS, max_pending=MAX_PENDING_TICKS):
+        super().__init__(name='price-history', daemon=True)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.lost_ticks = 0
+        self.written = 0
+        self._product_pks = {}
+        self._closing = threading.Event()
+
+    def record(self, t, state, rows):
+        """Enqueues the given state rows (typically the tick's `changed` mask)."""
+        rows = np.flatnonzero(rows)
+        if not len(rows):
+            return
+        tick = (
+            t,
+            [state.product_ids[i] for i in rows],
+            np.round(state.price[rows], 2),
+            np.round(state.mass[rows], 2),
+            state.stock[rows].copy(),
+        )
+        try:
+            self.queue.put_nowait(tick)
+        except queue.Full:
+            self.lost_ticks += 1
+
+    def run(self):
+        batch, size = [], 0
+        deadline = time.monotonic() + self.flush_seconds
+        while not (self._closing.is_set() and self.queue.empty()):
+            try:
+                tick = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                batch.append(tick)
+                size += len(tick[1])
+            except queue.Empty:
+                pass
+
+            if size >= self.flush_rows or time.monotonic() >= deadline:
+                if batch:
+                    self.flush(PriceSample, batch)
+                batch, size = [], 0
+                deadline = time.monotonic() + self.flush_seconds
+
+        if batch:
+            self.flush(PriceSample, batch)
+        connection.close()
+
+    def flush(self, model, batch):
+        close_old_connections()
+        try:
+            with metrics.timer('history.flush'):
+                self._resolve(sku for tick in batch for sku in tick[1])
+                samples = []
+                for t, skus, prices, masses, stocks in batch:
+                    stamp = datetime.fromtimestamp(t, tz=timezone.utc)
+                    for sku, price, mass, stock in zip(skus, prices.tolist(), masses.tolist(), stocks.tolist()):
+                        # IDs without a Product row (e.g. --product fallbacks) are not kept
+                        pk = self._product_pks.get(sku)
+                        if pk is not None:
+                            samples.append(model(product_id=pk, t=stamp, price=price, mass=mass, stock=stock))
+                model.objects.bulk_create(samples, batch_size=self.flush_rows)
+            self.written += len(samples)
+        except Exception:
+            # Database unavailable; history is best effort, the engine keeps ticking
+            self.lost_ticks += len(batch)
+
+    def _resolve(self, skus):
+        """Caches sku -> Product pk for every sku not seen before."""
+        missing = list(set(skus) - self._product_pks.keys())
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            chunk = missing[start:start + LOOKUP_CHUNK]
+            found = dict(Product.objects.filter(sku__in=chunk).values_list('sku', 'pk'))
+            for sku in chunk:
+                self._product_pks[sku] = found.get(sku)
+
+    def close(self, timeout=10.0):
+        """Stops the writer after flushing everything already queued."""
+        self._closing.set()
+        self.join(timeout)
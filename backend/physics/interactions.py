@@ -0,0 +1,149 @@
+"""
+Per-worker Interaction Coalescing Buffer
+Sums FLICK/COLLISION counts per product in memory and flushes them to Redis
+in one batched pipeline per window instead of one write set per event
+"""
+
+import asyncio
+import uuid
+import weakref
+from collections import Counter
+
+from django.conf import settings
+
+from . import heatmap
+from .redis_pool import PipelineScript, get_async_redis
+
+FLUSH_INTERVAL = getattr(settings, 'PULSE_INTERACTION_FLUSH_MS', 50) / 1000.0
+FLUSH_SIZE = getattr(settings, 'PULSE_INTERACTION_FLUSH_SIZE', 500) # Distinct products
+HITS_TTL = 60
+BATCH_TTL_MS = 300_000 # How long an applied batch id is remembered (covers every retry)
+
+# Hit counter script.
+#   KEYS: batch marker ('' = no marker), then one hit counter per product
+#   ARGV: hits ttl, batch ttl_ms, then one count per product
+# With a marker the batch is applied at most once: a retry after a reply
+# timeout (the first attempt may already have run) changes nothing.
+HITS_SCRIPT = """
+if KEYS[1] ~= '' and not redis.call('SET', KEYS[1], 1, 'NX', 'PX', ARGV[2]) then
+    return 0
+end
+for i = 2, #KEYS do
+    redis.call('INCRBY', KEYS[i], ARGV[i + 1])
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+end
+return 1
+"""
+_hits_script = PipelineScript(HITS_SCRIPT)
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+class InteractionBuffer:
+    """
+    Aggregates interaction counts for one event loop.
+    Flushes every FLUSH_INTERVAL, or as soon as FLUSH_SIZE distinct products are pending.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.pending = Counter()
+        self._unsent = None # (batch id, counts) of a flush that may or may not have landed
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def record(self, product_id, count=1):
+        """Counts an interaction; never touches Redis directly."""
+        self.pending[product_id] += count
+        if len(self.pending) >= self.flush_size:
+            self._wake.set()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        """Flush loop; exits once nothing is pending and restarts on the next record()."""
+        try:
+            while self.pending or self._unsent is not None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                await self.flush()
+                if self._unsent is not None:
+                    # Redis failed; back off for one window before retrying
+                    await asyncio.sleep(self.flush_interval)
+        finally:
+            self._task = None
+
+    async def flush(self):
+        """
+        Writes every pending count in a single pipelined round trip.
+        A failed batch is retried as is, under the same batch id, before any
+        newer counts: a timeout may fire after Redis already applied it, and
+        the id makes the retry a no-op in that case.
+        """
+        if self._unsent is None:
+            if not self.pending:
+                return
+            self._unsent = (uuid.uuid4().hex, self.pending)
+            self.pending = Counter()
+        batch_id, batch = self._unsent
+
+        pipe = get_async_redis().pipeline(transaction=False)
+        queue_interactions(pipe, batch, batch_id=batch_id)
+        try:
+            await pipe.execute()
+        except Exception:
+            return # Kept in _unsent for the next window instead of dropped
+        self._unsent = None
+
+    async def close(self):
+        """Final flush on shutdown: stops the timer, then writes the unsent batch and the pending counts."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass # A flush cut short stays in _unsent and is retried under its id below
+        await self.flush()
+        if self._unsent is None:
+            await self.flush()
+
+
+def queue_interactions(pipe, counts, batch_id=None):
+    """
+    Queues the writes for a {product_id: count} batch (sync or async pipeline).
+    With a batch_id every write is applied at most once, however often it is retried.
+    """
+    if not counts:
+        return
+    # Interaction Heatmap: sliding-window sketch + top-K (one script call per batch)
+    heatmap.queue_record(pipe, counts, marker=batch_key(batch_id, 'heat') if batch_id else None)
+
+    # Individual hit counters, drained by the decay engine
+    keys = [batch_key(batch_id, 'hits') if batch_id else '']
+    keys += [f"sc:prod:hits:{product_id}" for product_id in counts]
+    args = [HITS_TTL, BATCH_TTL_MS] + [int(count) for count in counts.values()]
+    _hits_script.queue(pipe, keys, args)
+
+
+def batch_key(batch_id, part):
+    return f"sc:interactions:batch:{batch_id}:{part}"
+
+
+def get_interaction_buffer():
+    """Returns the buffer shared by every consumer on the running event loop."""
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = _buffers[loop] = InteractionBuffer()
+    return buffer
+
+
+async def close_interaction_buffer():
+    """Flushes and drops the running event loop's buffer (worker shutdown)."""
+    buffer = _buffers.pop(asyncio.get_running_loop(), None)
+    if buffer is not None:
+        await buffer.close()
@@ -0,0 +1,137 @@
+"""
+Shard Leases
+Splits per-shard work across processes (decay engines, stream bridges): live
+workers of a role heartbeat into one sorted set, shards are assigned by
+rendezvous hashing over them and a Redis lease guarantees exactly one owner
+per shard
+"""
+
+import os
+import random
+import socket
+import zlib
+
+from django.conf import settings
+
+from .shards import PULSE_SHARDS
+
+WORKERS_KEY = "sc:{role}:workers" # worker id -> last heartbeat (ms, Redis clock)
+LEASE_TTL_MS = getattr(settings, 'DECAY_LEASE_TTL_MS', 3000)
+
+# Heartbeat script.
+#   KEYS: workers zset, then the lease of every shard the worker believes it holds
+#   ARGV: worker id, ttl_ms
+# Records the heartbeat, forgets workers silent for longer than the ttl and
+# renews each lease still held by this worker. Returns {live workers, held flags}.
+HEARTBEAT_SCRIPT = """
+local now = redis.call('TIME')
+local ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local ttl = tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], ms, ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ms - ttl)
+
+local held = {}
+for i = 2, #KEYS do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('PEXPIRE', KEYS[i], ttl)
+        held[i - 1] = 1
+    else
+        held[i - 1] = 0
+    end
+end
+return {redis.call('ZRANGE', KEYS[1], 0, -1), held}
+"""
+
+# Release script.
+#   KEYS: leases to hand back
+#   ARGV: worker id
+# Deletes only the leases this worker still holds (never a successor's).
+RELEASE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+    end
+end
+return 1
+"""
+
+
+def lease_key(shard, role='decay'):
+    return f"sc:{role}:lease:{shard}"
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{random.getrandbits(32):08x}"
+
+
+def owner_of(shard, workers):
+    """
+    Rendezvous (highest random weight) hashing: every process computes the same
+    owner, and when a worker joins or leaves only its own shards move.
+    """
+    return max(workers, key=lambda worker: zlib.crc32(f"{worker}:{shard}".encode()), default=None)
+
+
+class ShardLeases:
+    """
+    One worker's view of shard ownership.
+    heartbeat() is called every tick: it renews held leases, hands back shards
+    that now belong to another live worker and takes the free ones assigned
+    to this worker (a dead owner's lease simply expires first).
+    """
+
+    def __init__(self, r, role='decay', shards=PULSE_SHARDS, ttl_ms=LEASE_TTL_MS, worker_id=None):
+        self.r = r
+        self.role = role
+        self.workers_key = WORKERS_KEY.format(role=role)
+        self.shards = shards
+        self.ttl_ms = ttl_ms
+        self.worker_id = worker_id or new_worker_id()
+        self.owned = set()
+        self.heartbeat_script = r.register_script(HEARTBEAT_SCRIPT)
+        self.release_script = r.register_script(RELEASE_SCRIPT)
+
+    @property
+    def fence(self):
+        """(token, lease keys) that a write-back must still hold to be applied."""
+        return self.worker_id, [self.lease_key(shard) for shard in sorted(self.owned)]
+
+    def lease_key(self, shard):
+        return lease_key(shard, self.role)
+
+    def heartbeat(self):
+        """Renews and rebalances. Returns True when the owned shard set changed."""
+        # 1. Heartbeat + renew in one call
+        believed = sorted(self.owned)
+        live, held = self.heartbeat_script(
+            keys=[self.workers_key] + [self.lease_key(shard) for shard in believed],
+            args=[self.worker_id, self.ttl_ms],
+        )
+        live = [worker.decode() for worker in live]
+        owned = {shard for shard, ok in zip(believed, held) if ok}
+
+        # 2. Hand back shards another live worker should own
+        wanted = {shard for shard in range(self.shards) if owner_of(shard, live) == self.worker_id}
+        released = owned - wanted
+        if released:
+            self.release_script(keys=[self.lease_key(shard) for shard in released], args=[self.worker_id])
+            owned -= released
+
+        # 3. Take free shards assigned to us (fails while the old owner's lease lives)
+        missing = sorted(wanted - owned)
+        if missing:
+            pipe = self.r.pipeline(transaction=False)
+            for shard in missing:
+                pipe.set(self.lease_key(shard), self.worker_id, nx=True, px=self.ttl_ms)
+            owned |= {shard for shard, ok in zip(missing, pipe.execute()) if ok}
+
+        changed = owned != self.owned
+        self.owned = owned
+        return changed
+
+    def leave(self):
+        """Releases every lease and the heartbeat so survivors take over at once."""
+        if self.owned:
+            self.release_script(keys=[self.lease_key(shard) for shard in self.owned], args=[self.worker_id])
+        self.r.zrem(self.workers_key, self.worker_id)
+        self.owned = set()
@@ -0,0 +1,159 @@
+"""
+Pulse Load Shedding
+Each ASGI worker measures its own event-loop lag and outbox backlog and
+degrades the pulse stream in tiers instead of letting every socket fall behind
+
+Tiers:
+    0  NORMAL         everything is sent
+    1  SHED_MOTION    per-tick pos/vel updates are dropped, prices still flow
+    2  SHED_RATE      outboxes flush at most SHED_RATE_HZ
+    3  REFUSE         new connections are refused with a retry hint
+
+Pass-through sockets are shed once per worker and frame (LoadMonitor.shed),
+on the raw bytes: no per-client decode while the worker is already overloaded.
+From SHED_MOTION up they only lose motion. Deltas carry just the fields that
+changed, so dropping a frame would lose price/stock changes until the next
+keyframe; only frames left empty by the strip (motion-only ticks) go away.
+"""
+
+import asyncio
+import weakref
+
+from django.conf import settings
+
+from . import metrics
+from .frames import FLAG_KEYFRAME, HEADER, is_frame, strip_fields
+
+NORMAL, SHED_MOTION, SHED_RATE, REFUSE = range(4)
+TIER_NAMES = ('normal', 'shed_motion', 'shed_rate', 'refuse')
+
+SAMPLE_INTERVAL = 0.05 # Loop lag probe period (s)
+SMOOTHING = 0.3        # EWMA weight of the newest lag sample
+
+# Entry thresholds for tiers 1..3; a tier is left below RECOVERY x its threshold
+LAG_THRESHOLDS = getattr(settings, 'PULSE_SHED_LAG_MS', (20, 50, 150))
+DEPTH_THRESHOLDS = getattr(settings, 'PULSE_SHED_DEPTH', (20_000, 50_000, 100_000)) # Pending updates per worker
+RECOVERY = 0.6
+
+SHED_RATE_HZ = getattr(settings, 'PULSE_SHED_RATE_HZ', 10)
+RETRY_AFTER_MS = 2000
+MOTION_FIELDS = ('pos', 'vel')
+
+PULSE_PUBLISH_HZ = getattr(settings, 'PULSE_PUBLISH_HZ', 60) # At or above this a client gets every frame
+SHED_MEMO = 256 # Shed frames remembered per worker (every client gets the same frame)
+
+_monitors = weakref.WeakKeyDictionary()
+
+
+class LoadMonitor:
+    """
+    Per-event-loop load probe.
+    Sleeps SAMPLE_INTERVAL in a loop; any extra delay before it wakes up is
+    time the loop spent busy elsewhere (lag). Outboxes register themselves so
+    their pending depth counts towards the tier as well.
+    """
+
+    def __init__(self):
+        self.tier = NORMAL
+        self.lag = 0.0
+        self.outboxes = weakref.WeakSet()
+        self._shed = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def register(self, outbox):
+        self.outboxes.add(outbox)
+
+    @property
+    def depth(self):
+        return sum(outbox.depth for outbox in self.outboxes)
+
+    @property
+    def min_interval(self):
+        """Minimum seconds between outbox flushes at the current tier."""
+        return 1.0 / SHED_RATE_HZ if self.tier >= SHED_RATE else 0.0
+
+    def shed(self, binary_data):
+        """
+        The message a pass-through client gets at the current tier: the frame
+        itself, a copy without motion blocks, or None (nothing but motion).
+        Worked out once per frame and worker, whatever the number of clients.
+        """
+        if self.tier < SHED_MOTION or not is_frame(binary_data):
+            return binary_data
+        _, _, flags, _, source, seq, _, _ = HEADER.unpack_from(binary_data, 0)
+        if flags & FLAG_KEYFRAME:
+            return binary_data # Rare, and puts motion back in sync
+
+        key = (source, seq)
+        if key in self._shed:
+            return self._shed[key]
+        if len(self._shed) >= SHED_MEMO:
+            self._shed.clear()
+
+        shed = strip_fields(binary_data, MOTION_FIELDS)
+        if shed is None:
+            metrics.count('shed.dropped_frames')
+        self._shed[key] = shed
+        return shed
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            lag = max(0.0, loop.time() - start - SAMPLE_INTERVAL)
+            self.lag += SMOOTHING * (lag - self.lag)
+            metrics.record('loop.lag', lag)
+            self.update(self.lag * 1000.0, self.depth)
+
+    def update(self, lag_ms, depth):
+        """Moves up as soon as a threshold is crossed, down only once clearly recovered."""
+        previous = self.tier
+        target = max(_level(lag_ms, LAG_THRESHOLDS), _level(depth, DEPTH_THRESHOLDS))
+        while target < self.tier:
+            index = self.tier - 1
+            if lag_ms >= LAG_THRESHOLDS[index] * RECOVERY or depth >= DEPTH_THRESHOLDS[index] * RECOVERY:
+                break
+            self.tier -= 1
+        if target > self.tier:
+            self.tier = target
+        if self.tier != previous:
+            metrics.count(f"shed.enter.{TIER_NAMES[self.tier]}")
+
+        metrics.gauge('shed.tier', self.tier)
+        metrics.gauge('loop.lag_ms', round(lag_ms, 2))
+        metrics.gauge('outbox.depth', depth)
+
+
+def _level(value, thresholds):
+    return sum(1 for threshold in thresholds if value >= threshold)
+
+
+def strip_motion(pending):
+    """
+    Tier 1: drops pos/vel from a pending {product_id: fields} map in place.
+    Returns the number of updates dropped.
+    """
+    dropped = 0
+    for pid in list(pending):
+        fields = pending[pid]
+        for name in MOTION_FIELDS:
+            if fields.pop(name, None) is not None:
+                dropped += 1
+        if not fields:
+            del pending[pid]
+    return dropped
+
+
+def get_load_monitor():
+    """Returns (and starts) the monitor for the running event loop."""
+    loop = asyncio.get_running_loop()
+    monitor = _monitors.get(loop)
+    if monitor is None:
+        monitor = _monitors[loop] = LoadMonitor()
+        monitor.start()
+    return monitor
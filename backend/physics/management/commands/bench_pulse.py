@@ -0,0 +1,183 @@
+import asyncio
+import json
+import platform
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from physics.frames import FrameDecoder, is_frame
+from physics.management.commands.mock_pulse import orbit_columns
+from physics.shards import ShardedFrameEncoder, shard_group
+
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class Command(BaseCommand):
+    help = 'Load-tests the ws/pulse/ fan-out in-process and reports latency/throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100, help='Simulated ws/pulse/ clients')
+        parser.add_argument('--products', type=int, default=100, help='Products pulsed per tick')
+        parser.add_argument('--hz', type=float, default=60.0, help='Publisher frequency in Hz')
+        parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds')
+        parser.add_argument('--query', type=str, default='',
+                            help='Extra ws/pulse/ query string, e.g. "conflate=0" or "products=mock_00001"')
+        parser.add_argument('--redis-layer', action='store_true',
+                            help='Use the configured CHANNEL_LAYERS instead of the in-memory layer')
+        parser.add_argument('--output', type=str, help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if options['redis_layer']:
+            report = asyncio.run(self.run(options))
+        else:
+            with override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER):
+                report = asyncio.run(self.run(options))
+
+        results = report['results']
+        self.stdout.write(self.style.SUCCESS(
+            f"Pulse fan-out: {options['clients']} clients x {options['products']} products @ {options['hz']}Hz"
+        ))
+        self.stdout.write(
+            f"Latency p50 {results['latency_ms']['p50']:.2f}ms | p99 {results['latency_ms']['p99']:.2f}ms | "
+            f"p999 {results['latency_ms']['p999']:.2f}ms"
+        )
+        self.stdout.write(
+            f"{results['messages_per_sec']:.0f} msg/s | {results['bytes_per_sec'] / 1024:.0f} KiB/s | "
+            f"dropped updates {results['dropped_updates']} ({results['drop_ratio'] * 100:.2f}%)"
+        )
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(payload)
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+    async def run(self, options):
+        # Imported here so the ASGI app is built under the overridden layer settings
+        from swiftcart.asgi import application
+
+        query = 'token=bench'
+        if options['query']:
+            query += '&' + options['query']
+
+        clients = []
+        for _ in range(options['clients']):
+            communicator = WebsocketCommunicator(application, f"/ws/pulse/?{query}")
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError("Benchmark client was refused by PulseConsumer")
+            clients.append(_BenchClient(communicator))
+
+        readers = [asyncio.ensure_future(client.read()) for client in clients]
+        published = await self.publish(options)
+
+        # Let in-flight frames land before stopping the readers
+        await asyncio.sleep(0.5)
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        for client in clients:
+            await client.communicator.disconnect()
+
+        return self.report(options, clients, published)
+
+    async def publish(self, options):
+        """mock_pulse-style publisher driven straight into the shard groups."""
+        channel_layer = get_channel_layer()
+        encoder = ShardedFrameEncoder()
+        product_ids = [f"mock_{i:05d}" for i in range(options['products'])]
+        interval = 1.0 / options['hz']
+
+        published = {'frames': 0, 'updates': 0, 'ticks': 0}
+        start = time.monotonic()
+        deadline = start + options['duration']
+        next_tick = start
+        while next_tick < deadline:
+            columns = orbit_columns(len(product_ids), next_tick - start)
+            for shard, binary_data in encoder.encode(product_ids, columns):
+                await channel_layer.group_send(shard_group(shard), {
+                    "type": "pulse.message",
+                    "data": binary_data,
+                })
+                published['frames'] += 1
+            published['updates'] += len(product_ids)
+            published['ticks'] += 1
+
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+        published['elapsed'] = time.monotonic() - start
+        return published
+
+    def report(self, options, clients, published):
+        latencies = np.concatenate([np.asarray(c.latencies) for c in clients]) * 1000.0
+        if not len(latencies):
+            latencies = np.array([np.nan])
+        elapsed = published['elapsed']
+        messages = sum(c.messages for c in clients)
+        received_bytes = sum(c.bytes for c in clients)
+        received_updates = sum(c.updates for c in clients)
+
+        # Every client subscribes to every product unless --query narrows it
+        expected_updates = published['updates'] * len(clients)
+        dropped = max(0, expected_updates - received_updates) if 'products=' not in options['query'] else None
+
+        return {
+            'benchmark': 'pulse_fanout',
+            'timestamp': time.time(),
+            'platform': {'python': platform.python_version(), 'machine': platform.machine()},
+            'config': {
+                'clients': options['clients'],
+                'products': options['products'],
+                'hz': options['hz'],
+                'duration': options['duration'],
+                'query': options['query'],
+                'channel_layer': 'configured' if options['redis_layer'] else 'in_memory',
+            },
+            'results': {
+                'latency_ms': {
+                    'p50': float(np.percentile(latencies, 50)),
+                    'p99': float(np.percentile(latencies, 99)),
+                    'p999': float(np.percentile(latencies, 99.9)),
+                    'max': float(np.max(latencies)),
+                    'samples': int(len(latencies)),
+                },
+                'messages_per_sec': messages / elapsed,
+                'bytes_per_sec': received_bytes / elapsed,
+                'published_frames': published['frames'],
+                'published_ticks': published['ticks'],
+                'received_messages': messages,
+                'dropped_updates': dropped,
+                'drop_ratio': (dropped / expected_updates) if dropped and expected_updates else 0.0,
+            },
+        }
+
+
+class _BenchClient:
+    """One simulated browser: decodes frames and records end-to-end latency."""
+
+    def __init__(self, communicator):
+        self.communicator = communicator
+        self.decoder = FrameDecoder()
+        self.latencies = []
+        self.messages = 0
+        self.bytes = 0
+        self.updates = 0
+
+    async def read(self):
+        while True:
+            message = await self.communicator.receive_output(timeout=3600)
+            binary_data = message.get('bytes')
+            if not binary_data:
+                continue
+            now = time.time()
+            self.messages += 1
+            self.bytes += len(binary_data)
+            if is_frame(binary_data):
+                frame = self.decoder.decode(binary_data)
+                self.latencies.append(now - frame['t'])
+                self.updates += len(frame['updates'])
@@ -1,42 +1,330 @@
 import asyncio
+import time
 import redis
-import json
-import msgpack
+import redis.asyncio as aioredis
 from django.core.management.base import BaseCommand
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from physics import metrics
+from physics.frames import frame_source, is_frame
+from physics.leases import LEASE_TTL_MS, ShardLeases
+from physics.shards import GLOBAL_GROUP, shard_channel, shard_group
+from physics.transport import (
+    PULSE_TRANSPORT, STREAM, STREAM_FIELD, STREAM_GROUP, TRANSPORTS,
+    SequenceTracker, channel_of, stream_key,
+)
+from physics.world import PUBLISH_INTERVAL, WorldBuilder, queue_store
+
+STATS_KEY = "sc:metrics:bridge"
+HEARTBEAT_SECONDS = LEASE_TTL_MS / 3000.0 # Renew shard leases three times per ttl
+READ_BLOCK_MS = 500
+RECLAIM_SECONDS = 5.0     # How often our own stuck stream entries are looked for
+RECLAIM_IDLE_MS = 10_000  # Pending this long = its group_send failed (well above forward lag)
+
 
 class Command(BaseCommand):
-    help = 'Bridges Redis Pub/Sub price pulses to Django Channels'
+    help = 'Bridges Redis Pub/Sub (or Streams) price pulses to Django Channels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=float, default=5.0,
+                            help='Coalescing window in milliseconds (default 5ms)')
+        parser.add_argument('--max-batch', type=int, default=64,
+                            help='Max frames forwarded in one group_send')
+        parser.add_argument('--max-queue', type=int, default=1024,
+                            help='Pending frames before the oldest are dropped')
+        parser.add_argument('--stats-interval', type=float, default=5.0,
+                            help='Seconds between throughput/lag reports')
+        parser.add_argument('--transport', choices=TRANSPORTS, default=PULSE_TRANSPORT,
+                            help='pubsub: every bridge forwards everything; stream: bridges share '
+                                 'the shard streams and replay unacknowledged frames after a restart')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Starting Redis-to-Channels Pulse Bridge..."))
-        
-        # Connect to Redis
-        r = redis.Redis(host='localhost', port=6379, db=0)
-        pubsub = r.pubsub()
-        pubsub.subscribe('price_pulses')
-        
-        channel_layer = get_channel_layer()
-        
+
+        self.window = options['window'] / 1000.0
+        self.max_batch = options['max_batch']
+        self.stats_interval = options['stats_interval']
+        self.transport = options['transport']
+        self.queue = asyncio.Queue(maxsize=options['max_queue'])
+        self.sequences = SequenceTracker()
+        self.groups = {}
+        self.world = WorldBuilder()
+        self.resync = set() # Publishers whose next frame must be a keyframe (a delta was dropped)
+        self.stats = _empty_stats()
+
         try:
-            for message in pubsub.listen():
-                if message['type'] == 'message':
-                    # Message from Redis Pub/Sub
-                    # Expecting MessagePack binary data or JSON
-                    try:
-                        # We just forward the binary data to the Channels group
-                        # No need to decode/re-encode unless we need to inspect it
-                        binary_data = message['data']
-                        
-                        async_to_sync(channel_layer.group_send)(
-                            "global_pulse",
-                            {
-                                "type": "pulse.message",
-                                "data": binary_data,
-                            }
-                        )
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Bridge Error: {e}"))
+            asyncio.run(self.run())
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING("Bridge stopped."))
+
+    async def run(self):
+        r = aioredis.Redis(host='localhost', port=6379, db=0)
+        if self.transport == STREAM:
+            reader = self.read_streams(r)
+        else:
+            # Dedicated connection: pubsub holds it for good
+            pubsub = r.pubsub()
+            await pubsub.subscribe('price_pulses') # Unsharded publishers
+            await pubsub.psubscribe('price_pulses:*') # One channel per shard
+            reader = self.read(pubsub)
+
+        channel_layer = get_channel_layer()
+
+        await asyncio.gather(
+            reader,
+            self.forward(channel_layer, r),
+            self.report(r),
+            self.publish_world(r),
+            metrics.flush_forever(r),
+        )
+
+    async def read(self, pubsub):
+        """
+        Pulls raw frames off Pub/Sub without decoding them.
+        When the channel layer falls behind the oldest pending frame is dropped
+        and the next frame of its publisher goes out as a keyframe instead, so
+        clients never stay on deltas built on top of the lost one.
+        """
+        async for message in pubsub.listen():
+            if message['type'] not in ('message', 'pmessage'):
+                continue
+            if self.queue.full():
+                _, _, dropped, _ = self.queue.get_nowait()
+                if is_frame(dropped) and frame_source(dropped) in self.world.mirrors:
+                    self.resync.add(frame_source(dropped))
+                self.stats['dropped'] += 1
+            self.queue.put_nowait(self.frame_item(message['channel'], message['data']))
+
+    async def read_streams(self, r):
+        """
+        Reads the shard streams this bridge holds a lease for through the
+        consumer group (one reader per shard keeps its frames in order).
+        Entries stay pending until forwarded; when a shard is taken over, the
+        entries a dead or restarted bridge read but never acknowledged are
+        claimed and replayed first. A slow channel layer applies backpressure
+        instead of dropping: the stream keeps the backlog. Entries whose
+        group_send failed are reclaimed every RECLAIM_SECONDS (see reclaim).
+        """
+        leases = ShardLeases(redis.Redis(host='localhost', port=6379, db=0), role='bridge')
+        streams = {}
+        next_heartbeat = 0.0
+        next_reclaim = time.monotonic() + RECLAIM_SECONDS
+        try:
+            while True:
+                if time.monotonic() >= next_heartbeat:
+                    await asyncio.to_thread(leases.heartbeat)
+                    next_heartbeat = time.monotonic() + HEARTBEAT_SECONDS
+                    owned = {stream_key(shard_channel(shard)) for shard in sorted(leases.owned)}
+                    for stream in owned - streams.keys():
+                        await self.claim(r, stream, leases.worker_id)
+                    streams = {stream: '>' for stream in owned}
+
+                if time.monotonic() >= next_reclaim:
+                    next_reclaim = time.monotonic() + RECLAIM_SECONDS
+                    for stream in streams:
+                        await self.reclaim(r, stream, leases.worker_id)
+
+                if not streams:
+                    await asyncio.sleep(READ_BLOCK_MS / 1000.0)
+                    continue
+
+                replies = await r.xreadgroup(
+                    STREAM_GROUP, leases.worker_id, streams, count=self.max_batch, block=READ_BLOCK_MS,
+                )
+                for stream, entries in replies or ():
+                    for entry_id, fields in entries:
+                        await self.queue.put(self.frame_item(channel_of(stream), fields[STREAM_FIELD], (stream, entry_id)))
+        finally:
+            leases.leave()
+
+    async def claim(self, r, stream, consumer):
+        """Joins the stream's consumer group and replays its unacknowledged entries."""
+        try:
+            await r.xgroup_create(stream, STREAM_GROUP, id='$', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+        start = '0-0'
+        while True:
+            reply = await r.xautoclaim(stream, STREAM_GROUP, consumer, 0, start_id=start, count=self.max_batch)
+            start, entries = reply[0], reply[1]
+            for entry_id, fields in entries:
+                if fields: # Trimmed entries come back empty
+                    self.stats['replayed'] += 1
+                    await self.queue.put(self.frame_item(channel_of(stream), fields[STREAM_FIELD], (stream, entry_id)))
+            if start in (b'0-0', '0-0'):
+                break
+
+    async def reclaim(self, r, stream, consumer):
+        """
+        Settles our own entries left pending by a failed group_send. Newer
+        frames went out meanwhile, so replaying them would roll clients back:
+        they are acknowledged instead and their publishers' next frames are
+        sent as keyframes, which carry everything the lost ones did.
+        """
+        try:
+            start = '0-0'
+            while True:
+                reply = await r.xautoclaim(
+                    stream, STREAM_GROUP, consumer, RECLAIM_IDLE_MS, start_id=start, count=self.max_batch,
+                )
+                start, entries = reply[0], reply[1]
+                entry_ids = []
+                for entry_id, fields in entries:
+                    entry_ids.append(entry_id)
+                    binary_data = (fields or {}).get(STREAM_FIELD)
+                    if binary_data and is_frame(binary_data) and frame_source(binary_data) in self.world.mirrors:
+                        self.resync.add(frame_source(binary_data))
+                if entry_ids:
+                    self.stats['reclaimed'] += len(entry_ids)
+                    await r.xack(stream, STREAM_GROUP, *entry_ids)
+                if start in (b'0-0', '0-0'):
+                    break
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Bridge Reclaim Error: {e}"))
+
+    def frame_item(self, channel, binary_data, ack=None):
+        """
+        Queue entry for one frame; records sequence gaps and folds the frame
+        into the world state on the way in. After a drop, the publisher's
+        mirrored keyframe (which already includes this frame) replaces it.
+        """
+        route = self.groups.get(channel)
+        if route is None:
+            route = self.groups[channel] = (_group_for(channel), _shard_for(channel))
+        group, shard = route
+
+        self.stats['received'] += 1
+        missed = self.sequences.observe(binary_data)
+        if missed:
+            self.stats['gaps'] += missed
+            metrics.count('bridge.gaps', missed)
+        if shard is not None and is_frame(binary_data):
+            self.world.apply(shard, binary_data)
+            if self.resync:
+                source = frame_source(binary_data)
+                keyframe = self.world.keyframe(source) if source in self.resync else None
+                if keyframe is not None:
+                    self.resync.discard(source)
+                    self.stats['resynced'] += 1
+                    binary_data = keyframe
+        return time.monotonic(), group, binary_data, ack
+
+    async def publish_world(self, r):
+        """Stores fresh keyframes for every shard that changed (see physics.world)."""
+        while True:
+            await asyncio.sleep(PUBLISH_INTERVAL)
+            try:
+                pipe = r.pipeline(transaction=False)
+                queue_store(pipe, self.world.keyframes())
+                await pipe.execute()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Bridge World Error: {e}"))
+
+    async def forward(self, channel_layer, r):
+        """
+        Coalesces frames arriving within the window into a single group_send
+        per target group. Stream entries are acknowledged once their group_send
+        went through; a failed send leaves them pending until reclaim() settles them.
+        """
+        while True:
+            received_at, group, binary_data, ack = await self.queue.get()
+            batches = {group: ([binary_data], [ack])}
+            count = 1
+            deadline = received_at + self.window
+
+            while count < self.max_batch:
+                if not self.queue.empty():
+                    _, group, binary_data, ack = self.queue.get_nowait()
+                else:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        _, group, binary_data, ack = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                frames, acks = batches.setdefault(group, ([], []))
+                frames.append(binary_data)
+                acks.append(ack)
+                count += 1
+
+            acked = {}
+            for group, (frames, acks) in batches.items():
+                try:
+                    # We just forward the binary data to the Channels group
+                    # No need to decode/re-encode unless we need to inspect it
+                    # ts lets consumers measure the channel-layer hop
+                    if len(frames) == 1:
+                        event = {"type": "pulse.message", "data": frames[0], "ts": time.time()}
+                    else:
+                        event = {"type": "pulse.batch", "frames": frames, "ts": time.time()}
+                    await channel_layer.group_send(group, event)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Bridge Error: {e}"))
+                    continue
+
+                self.stats['sends'] += 1
+                self.stats['forwarded'] += len(frames)
+                for ack in acks:
+                    if ack is not None:
+                        acked.setdefault(ack[0], []).append(ack[1])
+
+            if acked:
+                try:
+                    pipe = r.pipeline(transaction=False)
+                    for stream, entry_ids in acked.items():
+                        pipe.xack(stream, STREAM_GROUP, *entry_ids)
+                    await pipe.execute()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Bridge Ack Error: {e}"))
+
+            lag = time.monotonic() - received_at
+            self.stats['lag_max'] = max(self.stats['lag_max'], lag)
+            metrics.record('bridge.forward', lag)
+
+    async def report(self, r):
+        """Logs and publishes throughput and lag for the last interval."""
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            stats, self.stats = self.stats, _empty_stats()
+            snapshot = {
+                'in_per_sec': stats['received'] / self.stats_interval,
+                'out_per_sec': stats['forwarded'] / self.stats_interval,
+                'sends_per_sec': stats['sends'] / self.stats_interval,
+                'dropped': stats['dropped'],
+                'gaps': stats['gaps'],
+                'replayed': stats['replayed'],
+                'reclaimed': stats['reclaimed'],
+                'resynced': stats['resynced'],
+                'queue_depth': self.queue.qsize(),
+                'lag_max_ms': stats['lag_max'] * 1000,
+                't': time.time(),
+            }
+            self.stdout.write(
+                f"Bridge: {snapshot['in_per_sec']:.0f} in/s | {snapshot['sends_per_sec']:.0f} sends/s | "
+                f"queue {snapshot['queue_depth']} | dropped {snapshot['dropped']} | gaps {snapshot['gaps']} | "
+                f"max lag {snapshot['lag_max_ms']:.1f}ms"
+            )
+            try:
+                await r.hset(STATS_KEY, mapping=snapshot)
+                await r.expire(STATS_KEY, max(1, int(self.stats_interval * 3)))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Bridge Stats Error: {e}"))
+
+
+def _empty_stats():
+    return {'received': 0, 'forwarded': 0, 'sends': 0, 'dropped': 0, 'gaps': 0, 'replayed': 0, 'reclaimed': 0, 'resynced': 0, 'lag_max': 0.0}
+
+
+def _group_for(channel):
+    """price_pulses -> global_pulse, price_pulses:<n> -> pulse.shard.<n>"""
+    shard = _shard_for(channel)
+    return shard_group(shard) if shard is not None else GLOBAL_GROUP
+
+
+def _shard_for(channel):
+    """price_pulses -> None, price_pulses:<n> -> n"""
+    channel = channel.decode() if isinstance(channel, bytes) else channel
+    _, _, shard = channel.partition(':')
+    return int(shard) if shard else None
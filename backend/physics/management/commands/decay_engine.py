@@ -1,107 +1,197 @@
+import multiprocessing
 import time
 import redis
-import json
-import random
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connections
+from physics import metrics
+from physics.config import config
+from physics.decay import decay_tick
+from physics.history import HistoryWriter
+from physics.leases import ShardLeases
+from physics.shards import ShardedFrameEncoder, shard_channel, shard_for
+from physics.ticker import POLICIES, SKIP, Ticker
+from physics.transport import PULSE_TRANSPORT, TRANSPORTS
+from physics.state import StateStore, catalog_ids, catalog_version
+
+CATALOG_REFRESH_TICKS = 25 # Re-check the catalog version every ~5s at 200ms
+
 
 class Command(BaseCommand):
     help = 'Executes the Price Decay Engine (Temporal + Interaction-Driven)'
 
+    # Every worker (local or on another host) only decays the pulse shards it
+    # holds a lease for, so running several copies never double-decays a key.
+
     def add_arguments(self, parser):
-        parser.add_argument('--msrp', type=float, default=100.0, help='Initial MSRP price')
+        parser.add_argument('--msrp', type=float, default=100.0,
+                            help='MSRP for products without catalog meta (see warm_catalog)')
+        parser.add_argument('--max-stock', type=int, default=100,
+                            help='Initial stock for products without catalog meta')
         parser.add_argument('--interval', type=float, default=0.2, help='Decay interval in seconds (default 200ms)')
+        parser.add_argument('--product', action='append', dest='products',
+                            help='Product ID to tick when the catalog set is empty (repeatable)')
+        parser.add_argument('--no-history', action='store_true',
+                            help='Do not persist published states to PriceSample')
+        parser.add_argument('--transport', choices=TRANSPORTS, default=PULSE_TRANSPORT,
+                            help='Publish frames over Pub/Sub or capped Redis Streams (see bridge_pulse)')
+        parser.add_argument('--overrun', choices=POLICIES, default=SKIP,
+                            help='What to do with ticks missed after an overrun (skip or catch up)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes to fork; shards are balanced across all live workers')
 
     def handle(self, *args, **options):
-        msrp = options['msrp']
+        self.msrp = options['msrp']
+        self.max_stock = options['max_stock']
+        self.fallback_ids = options['products'] or ["pro_001_nebula"]
         interval = options['interval']
-        floor_price = msrp * 0.70
-        base_mass = 1.0
-        mass_multiplier = 0.2 # 0.2 unit of mass per hit
-        
+
         self.stdout.write(self.style.SUCCESS(f"Starting Price Decay Engine..."))
-        self.stdout.write(f"MSRP: {msrp} | Floor: {floor_price} | Interval: {interval}s")
-        
+        self.stdout.write(f"MSRP: {self.msrp} | Floor: {self.msrp * 0.70} | Interval: {interval}s")
+
+        workers = max(1, options['workers'])
+        if workers == 1:
+            self.run_worker(options)
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=self.run_worker, args=(options,), name=f"decay-{i}")
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
+            self.stdout.write(self.style.WARNING("Decay Engine stopped."))
+
+    def run_worker(self, options):
+        interval = options['interval']
         r = redis.Redis(host='localhost', port=6379, db=0)
-        
-        # Simulation product ID
-        product_id = "pro_001_nebula"
-        
-        # Initialize price if not exists
-        if not r.exists(f"sc:prod:price:{product_id}"):
-            r.set(f"sc:prod:price:{product_id}", msrp)
-            
+        store = StateStore(r, transport=options['transport'])
+        config.watch(r) # God Mode changes land on the next tick
+        leases = ShardLeases(r)
+        self.encoder = ShardedFrameEncoder()
+        self.catalog_version = None
+        self.shards = set()
+        state = store.build_state([], msrp=self.msrp, max_stock=self.max_stock)
+        hits = np.zeros(0, dtype=np.int64)
+
+        # Durable history is written behind the loop; the tick never waits on the database
+        history = None if options['no_history'] else HistoryWriter()
+        if history is not None:
+            history.start()
+
         try:
-            while True:
-                # 1. Fetch current state
-                current_price_raw = r.get(f"sc:prod:price:{product_id}")
-                current_price = float(current_price_raw) if current_price_raw else msrp
-                
-                # 2. Fetch and reset hits
-                hits_raw = r.getset(f"sc:prod:hits:{product_id}", 0)
-                hits = int(hits_raw) if hits_raw else 0
-                
-                # 3. Calculate Decay
-                temporal_decay = 0.01 
-                interaction_decay = hits * 0.05
-                new_price = current_price - (temporal_decay + interaction_decay)
-                
-                # 4. Enforce 70% Floor
-                if new_price < floor_price:
-                    new_price = floor_price
-                
-                # 4b. Calculate Communal Mass
-                current_mass_raw = r.get(f"sc:prod:mass:{product_id}")
-                current_mass = float(current_mass_raw) if current_mass_raw else base_mass
-                new_mass = current_mass + (hits * mass_multiplier)
-                new_mass = max(base_mass, new_mass - (new_mass - base_mass) * 0.05)
-                    
-                # 4c. [STORY 3.2] Threshold Escalation Logic (Stock-driven)
-                max_stock = 100
-                stock_raw = r.get(f"sc:prod:stock:{product_id}")
-                if stock_raw is None:
-                    r.set(f"sc:prod:stock:{product_id}", max_stock)
-                    current_stock = max_stock
+            for tick in Ticker(interval, name='decay', policy=options['overrun']):
+                # 1. Heartbeat, renew leases and pick up / hand back shards
+                rebalanced = leases.heartbeat()
+                if rebalanced or tick % CATALOG_REFRESH_TICKS == 0:
+                    new_state = self.load_catalog(r, store, leases, previous=state)
+                    hits, dropped = _realign(hits, state.product_ids, new_state.product_ids)
+                    store.restore_hits(*dropped) # Hits of handed-off products go to their new owner
+                    state = new_state
+
+                if not len(state):
+                    continue
+
+                # 2. Fetch current state for the owned slice (one round trip)
+                store.load(state)
+
+                # 3. One vectorized pass: decay, floor, mass, stock, instability
+                with metrics.timer('decay.tick'):
+                    now = time.time()
+                    stock_delta, changed = decay_tick(
+                        state, hits,
+                        mass_per_hit=config['mass_per_hit'],
+                        temporal_decay=config['temporal_decay'],
+                        interaction_decay=config['interaction_decay'],
+                        base_mass_scale=config['base_mass'],
+                    )
+                    messages = self.build_pulses(state, hits, t=now)
+
+                for i in np.flatnonzero(changed & (hits > 0)):
+                    self.stdout.write(
+                        f"Price Update: {state.product_ids[i]} -> ${state.price[i]:.2f} | "
+                        f"Mass: {state.mass[i]:.2f} | Stock: {state.stock[i]} (Hits: {hits[i]})"
+                    )
+
+                # 4. Atomic write-back + hit drain + publish, fenced by our leases (one round trip)
+                with metrics.timer('redis.publish'):
+                    drained = store.commit(state, stock_delta, messages, fence=leases.fence, hits=hits)
+                if drained is None:
+                    # A lease was lost mid-tick: nothing was written (hits were given back), re-sync next tick
+                    metrics.count('decay.fenced')
+                    hits = np.zeros(len(state), dtype=np.int64)
                 else:
-                    current_stock = int(stock_raw)
-                    
-                # Simulate stock decay if there are hits or slowly over time
-                if hits > 0 or random.random() < 0.05:
-                    current_stock = max(0, current_stock - (1 if hits > 0 else 0))
-                    r.set(f"sc:prod:stock:{product_id}", current_stock)
-
-                stock_pct = (current_stock / max_stock) * 100
-                instability = 0.0
-                
-                if current_stock == 1:
-                    instability = 1.0 # Max instability for the final desync
-                elif stock_pct <= 5:
-                    instability = 0.8
-                elif stock_pct <= 10:
-                    instability = 0.5
-                elif stock_pct <= 20:
-                    instability = 0.2
-
-                # 5. Update Redis State
-                r.set(f"sc:prod:price:{product_id}", new_price)
-                r.set(f"sc:prod:mass:{product_id}", new_mass)
-                
-                # 6. Publish Pulse
-                import msgpack
-                payload = {
-                    'id': product_id,
-                    'p': round(new_price, 2),
-                    'm': round(new_mass, 2), # Communal Mass
-                    'ins': instability, # Instability (Redshift)
-                    'stk': current_stock, # Current Stock Level
-                    'hits': hits,
-                    't': time.time()
-                }
-                binary_data = msgpack.packb(payload, use_bin_type=True)
-                r.publish('price_pulses', binary_data)
-                
-                if hits > 0 or abs(new_price - current_price) > 0.001:
-                    self.stdout.write(f"Price Update: {product_id} -> ${new_price:.2f} | Mass: {new_mass:.2f} | Stock: {current_stock} (Hits: {hits})")
-                
-                time.sleep(interval)
-                
+                    hits = drained
+                    if history is not None:
+                        history.record(now, state, changed)
+                metrics.flush(r)
+
         except KeyboardInterrupt:
-            self.stdout.write(self.style.WARNING("Decay Engine stopped."))
+            self.stdout.write(self.style.WARNING(f"Decay worker {leases.worker_id} stopped."))
+        finally:
+            # Drained hits not applied yet belong to whoever takes the shards over
+            store.restore_hits(state.product_ids, hits)
+            leases.leave()
+            if history is not None:
+                history.close()
+                self.stdout.write(f"History: {history.written} samples written, {history.lost_ticks} ticks lost")
+
+    def load_catalog(self, r, store, leases, previous):
+        """
+        Builds the column arrays for the products of the shards this worker
+        holds, from the catalog set (or the fallback IDs) and the per-product
+        rules published by warm_catalog.
+        Keeps the existing state object until the catalog version or the owned
+        shards change.
+        """
+        version = catalog_version(r)
+        if version == self.catalog_version and leases.owned == self.shards:
+            return previous
+
+        for shard in self.shards - leases.owned:
+            self.encoder.discard(shard)
+        self.catalog_version = version
+        self.shards = set(leases.owned)
+
+        product_ids = [pid for pid in catalog_ids(r, self.fallback_ids) if shard_for(pid) in self.shards]
+        state = store.build_state(product_ids, msrp=self.msrp, max_stock=self.max_stock)
+        if product_ids:
+            store.ensure(state)
+
+        self.stdout.write(
+            f"Catalog loaded: {len(state)} products (version {version}) | "
+            f"Shards: {sorted(self.shards)} ({leases.worker_id})"
+        )
+        return state
+
+    def build_pulses(self, state, hits, t=None):
+        """One delta-compressed frame per shard covering every product that changed this tick."""
+        frames = self.encoder.encode(state.product_ids, {
+            'p': np.round(state.price, 2),
+            'm': np.round(state.mass, 2), # Communal Mass
+            'ins': state.instability, # Instability (Redshift)
+            'stk': state.stock, # Current Stock Level
+            'hits': hits,
+        }, t=t)
+        return [(shard_channel(shard), binary_data) for shard, binary_data in frames]
+
+
+def _realign(values, old_ids, new_ids):
+    """
+    Carries per-product values over to a reloaded catalog order.
+    Returns (values, (dropped ids, their values)) for products no longer held.
+    """
+    if old_ids == new_ids:
+        return values, ((), ())
+    lookup = dict(zip(old_ids, values))
+    realigned = np.array([lookup.pop(pid, 0) for pid in new_ids], dtype=values.dtype)
+    return realigned, (list(lookup), list(lookup.values()))
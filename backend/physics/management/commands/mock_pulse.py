@@ -1,46 +1,61 @@
 import time
-import random
 import uuid
 import math
+import redis
+import numpy as np
 from django.core.management.base import BaseCommand
-from physics.pulse import broadcast_price_pulse
+from physics import metrics
+from physics.pulse import broadcast_pulse_batch
+from physics.ticker import POLICIES, SKIP, Ticker
+
+
+def orbit_columns(count, elapsed, base_price=100.0):
+    """
+    Simulated state for `count` orbs on a fixed circle (one tick).
+    Orbs are spread evenly around the orbit so they don't overlap.
+    """
+    # Simulate orbital movement for sync testing
+    # x = center + radius * cos(theta)
+    radius = 200
+    theta = elapsed * 1.5 + np.arange(count) * (2 * math.pi / max(count, 1)) # Rotation speed
+    pos = np.column_stack((400 + radius * np.cos(theta), 300 + radius * np.sin(theta)))
+    vel = np.column_stack((-radius * 1.5 * np.sin(theta), radius * 1.5 * np.cos(theta)))
+
+    # Simulate a small price fluctuation
+    price = base_price + np.random.uniform(-0.5, 0.5, count)
+    return {'p': price, 'pos': pos, 'vel': vel}
+
 
 class Command(BaseCommand):
-    help = 'Simulates a 60Hz price pulse for a mock product'
+    help = 'Simulates a 60Hz price pulse for mock products'
 
     def add_arguments(self, parser):
         parser.add_argument('--product_id', type=str, help='Product UUID to pulse')
+        parser.add_argument('--products', type=int, default=1, help='Number of mock products to pulse')
         parser.add_argument('--hz', type=str, default=60, help='Frequency in Hz')
+        parser.add_argument('--overrun', choices=POLICIES, default=SKIP,
+                            help='What to do with ticks missed after an overrun (skip or catch up)')
 
     def handle(self, *args, **options):
-        product_id = options['product_id'] or str(uuid.uuid4())
+        count = options['products']
+        if count == 1:
+            product_ids = [options['product_id'] or str(uuid.uuid4())]
+        else:
+            prefix = options['product_id'] or 'mock'
+            product_ids = [f"{prefix}_{i:05d}" for i in range(count)]
         hz = int(options['hz'])
         interval = 1.0 / hz
-        
-        base_price = 100.0
-        self.stdout.write(self.style.SUCCESS(f"Starting {hz}Hz pulse for product {product_id}"))
-        
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Starting {hz}Hz pulse for {count} product(s) ({product_ids[0]}...)"
+        ))
+
+        r = redis.Redis(host='localhost', port=6379, db=0)
         try:
             start_time = time.time()
-            while True:
+            for _ in Ticker(interval, name='mock_pulse', policy=options['overrun']):
                 elapsed = time.time() - start_time
-                # Simulate a small price fluctuation
-                price = base_price + random.uniform(-0.5, 0.5)
-                
-                # Simulate orbital movement for sync testing
-                # x = center + radius * cos(theta)
-                radius = 200
-                theta = elapsed * 1.5 # Rotation speed
-                pos = {
-                    'x': 400 + radius * math.cos(theta),
-                    'y': 300 + radius * math.sin(theta)
-                }
-                vel = {
-                    'x': -radius * 1.5 * math.sin(theta),
-                    'y': radius * 1.5 * math.cos(theta)
-                }
-                
-                broadcast_price_pulse(product_id, price, pos, vel)
-                time.sleep(interval)
+                broadcast_pulse_batch(product_ids, orbit_columns(count, elapsed))
+                metrics.flush(r)
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING("Pulse stopped."))
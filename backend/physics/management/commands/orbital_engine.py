@@ -0,0 +1,86 @@
+import time
+import redis
+import numpy as np
+from collections import Counter
+from django.core.management.base import BaseCommand
+from physics import metrics
+from physics.config import config
+from physics.interactions import queue_interactions
+from physics.orbital import OrbitalWorld
+from physics.shards import ShardedFrameEncoder, shard_channel
+from physics.state import catalog_ids, catalog_version, read_masses
+from physics.ticker import POLICIES, SKIP, Ticker
+from physics.transport import PULSE_TRANSPORT, TRANSPORTS, queue_publish
+
+REFRESH_SECONDS = 1.0 # Catalog and mass are re-read about once a second
+
+
+class Command(BaseCommand):
+    help = 'Runs the server-authoritative orbital simulation and publishes positions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hz', type=float, default=60.0, help='Simulation frequency in Hz')
+        parser.add_argument('--product', action='append', dest='products',
+                            help='Product ID to simulate when the catalog set is empty (repeatable)')
+        parser.add_argument('--seed', type=int, help='Seed for the initial orbit layout')
+        parser.add_argument('--transport', choices=TRANSPORTS, default=PULSE_TRANSPORT,
+                            help='Publish frames over Pub/Sub or capped Redis Streams (see bridge_pulse)')
+        parser.add_argument('--overrun', choices=POLICIES, default=SKIP,
+                            help='What to do with steps missed after an overrun (skip or catch up)')
+
+    def handle(self, *args, **options):
+        self.fallback_ids = options['products'] or ["pro_001_nebula"]
+        self.seed = options['seed']
+        interval = 1.0 / options['hz']
+
+        r = redis.Redis(host='localhost', port=6379, db=0)
+        encoder = ShardedFrameEncoder()
+        world = None
+
+        self.stdout.write(self.style.SUCCESS(f"Starting Orbital Engine @ {options['hz']:g}Hz"))
+
+        try:
+            next_refresh = time.monotonic() # The first step loads the world
+            for _ in Ticker(interval, name='orbital', policy=options['overrun']):
+                if time.monotonic() >= next_refresh:
+                    world = self.load_world(r, previous=world)
+                    config.watch(r) # Starts the listener once: gravity changes land on the next step
+                    next_refresh += REFRESH_SECONDS
+
+                # 1. Integrate + collide every body in one vectorized step
+                with metrics.timer('orbital.step'):
+                    started = world.step(interval, config['gravity'])
+                    frames = encoder.encode(world.product_ids, {'pos': world.pos, 'vel': world.vel})
+
+                # 2. Publish positions and collision hits (one round trip)
+                with metrics.timer('redis.publish'):
+                    pipe = r.pipeline(transaction=False)
+                    for shard, binary_data in frames:
+                        queue_publish(pipe, shard_channel(shard), binary_data, options['transport'])
+                    if len(started):
+                        queue_interactions(pipe, self.collision_counts(world, started))
+                    pipe.execute()
+                metrics.flush(r)
+
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Orbital Engine stopped."))
+
+    def load_world(self, r, previous=None):
+        """Rebuilds the world when the catalog version changes and refreshes every body's mass."""
+        version = catalog_version(r)
+        if previous is not None and version == self.catalog_version:
+            world = previous
+        else:
+            self.catalog_version = version
+            world = OrbitalWorld(catalog_ids(r, self.fallback_ids), seed=self.seed)
+            if previous is not None:
+                world.adopt(previous)
+            self.stdout.write(f"Catalog loaded: {len(world)} bodies")
+
+        world.set_mass(read_masses(r, world.product_ids))
+        return world
+
+    def collision_counts(self, world, started):
+        """COLLISION interactions: one hit for each body of every new contact."""
+        rows = np.bincount(started.ravel(), minlength=len(world))
+        return Counter({world.product_ids[i]: int(rows[i]) for i in np.flatnonzero(rows)})
@@ -0,0 +1,69 @@
+import time
+import redis
+from django.core.management.base import BaseCommand
+from physics.models import Product
+from physics.state import (
+    CATALOG_KEY, CATALOG_VERSION_KEY, mass_key, meta_key, price_key, stock_key,
+)
+
+STAGING_KEY = CATALOG_KEY + ":staging"
+
+
+class Command(BaseCommand):
+    help = 'Warms the Redis product state from the Product catalog (cold boot / deploy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database and written per pipeline')
+        parser.add_argument('--reset', action='store_true',
+                            help='Overwrite live price/stock/mass instead of only filling missing keys')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        set_options = {} if options['reset'] else {'nx': True}
+        r = redis.Redis(host='localhost', port=6379, db=0)
+        start = time.monotonic()
+
+        # 1. Stream the catalog in chunks (no model instances, no full materialisation)
+        rows = (
+            Product.objects.filter(is_active=True)
+            .order_by('pk')
+            .values_list('sku', 'msrp', 'floor_ratio', 'base_mass', 'max_stock')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        # 2. One pipelined round trip per chunk; the index is built on a staging set
+        r.delete(STAGING_KEY)
+        pipe = r.pipeline(transaction=False)
+        total = 0
+        for sku, msrp, floor_ratio, base_mass, max_stock in rows:
+            msrp = float(msrp)
+            pipe.hset(meta_key(sku), mapping={
+                'msrp': msrp,
+                'floor_ratio': floor_ratio,
+                'base_mass': base_mass,
+                'max_stock': max_stock,
+            })
+            pipe.set(price_key(sku), msrp, **set_options)
+            pipe.set(stock_key(sku), max_stock, **set_options)
+            pipe.set(mass_key(sku), base_mass, **set_options)
+            pipe.sadd(STAGING_KEY, sku)
+
+            total += 1
+            if total % chunk_size == 0:
+                pipe.execute()
+        pipe.execute()
+
+        # 3. Hand the index over atomically; engines reload on the version bump
+        pipe = r.pipeline(transaction=True)
+        if total:
+            pipe.rename(STAGING_KEY, CATALOG_KEY)
+        else:
+            pipe.delete(CATALOG_KEY)
+        pipe.incr(CATALOG_VERSION_KEY)
+        version = pipe.execute()[-1]
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalog warmed: {total} products in {elapsed:.2f}s (version {version})"
+        ))
@@ -0,0 +1,229 @@
+"""
+Pulse Path Latency Metrics
+Fixed-memory rolling histograms per stage, exported to Redis so the
+CelestialMetricsView can merge every process into true percentiles
+
+Stages:
+    decay.tick      decay engine compute (vectorized pass + frame encode)
+    redis.publish   decay/orbital engine write-back + publish round trip
+    orbital.step    orbital engine integrate + collide + frame encode
+    history.flush   write-behind bulk insert of price samples (off the tick)
+    bridge.forward  bridge receive -> group_send done
+    channel.hop     bridge group_send -> consumer handler
+    consumer.send   consumer socket send
+    pulse.e2e       tick timestamp -> consumer socket send
+    loop.lag        ASGI worker event-loop lag (load shedding probe)
+    <loop>.duration / <loop>.jitter
+                    tick work time and start lateness of the fixed-rate
+                    loops (decay, orbital, mock_pulse; see ticker)
+
+Gauges and counters (last value per process, e.g. the load shedding tier)
+are exported next to the histograms.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import weakref
+from contextlib import contextmanager
+
+import msgpack
+import numpy as np
+
+# Log-linear buckets (HDR-style): exact below 64us, then 32 sub-buckets per
+# power of two (~3% relative error), up to 60s. 704 counters per histogram.
+LINEAR_BUCKETS = 64
+SUB_BUCKETS = 32
+MAX_MICROS = 60_000_000
+BUCKETS = LINEAR_BUCKETS + (MAX_MICROS.bit_length() - 6) * SUB_BUCKETS
+
+WINDOW_SLOTS = 6          # Rolling window = WINDOW_SLOTS x SLOT_SECONDS
+SLOT_SECONDS = 10.0
+FLUSH_INTERVAL = 5.0      # Seconds between exports to Redis
+METRICS_KEY = "sc:metrics:hist:{stage}"
+STAGES_KEY = "sc:metrics:stages" # Every stage name ever exported (read_stages lists it instead of scanning)
+GAUGES_KEY = "sc:metrics:gauges"
+
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def bucket_index(micros):
+    if micros < LINEAR_BUCKETS:
+        return max(0, int(micros))
+    micros = min(int(micros), MAX_MICROS)
+    shift = micros.bit_length() - 6
+    return LINEAR_BUCKETS + (shift - 1) * SUB_BUCKETS + ((micros >> shift) - SUB_BUCKETS)
+
+
+def bucket_value(index):
+    """Midpoint of a bucket in microseconds."""
+    if index < LINEAR_BUCKETS:
+        return float(index)
+    k = index - LINEAR_BUCKETS
+    shift = k // SUB_BUCKETS + 1
+    low = (k % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return low + (1 << shift) / 2.0
+
+
+class LatencyHistogram:
+    """
+    Rolling histogram: one counter array per time slot, the oldest slot is
+    recycled as time moves on, so memory never grows with sample count.
+    """
+
+    def __init__(self, slots=WINDOW_SLOTS, slot_seconds=SLOT_SECONDS):
+        self.slot_seconds = slot_seconds
+        self.counts = np.zeros((slots, BUCKETS), dtype=np.int64)
+        self.slot_ids = np.full(slots, -1, dtype=np.int64)
+
+    def record(self, seconds, now=None):
+        slot_id = int((time.time() if now is None else now) // self.slot_seconds)
+        slot = slot_id % len(self.slot_ids)
+        if self.slot_ids[slot] != slot_id:
+            self.counts[slot] = 0
+            self.slot_ids[slot] = slot_id
+        self.counts[slot, bucket_index(seconds * 1_000_000)] += 1
+
+    def merged(self, now=None):
+        """Counts over the live window (expired slots are ignored)."""
+        current = int((time.time() if now is None else now) // self.slot_seconds)
+        live = self.slot_ids > current - len(self.slot_ids)
+        return self.counts[live].sum(axis=0)
+
+
+def percentiles(counts, quantiles=(50, 90, 99, 99.9)):
+    """{'p50': ms, ...} plus count/max for a merged counter array."""
+    counts = np.asarray(counts)
+    total = int(counts.sum())
+    if not total:
+        return {'count': 0}
+
+    cumulative = np.cumsum(counts)
+    result = {'count': total}
+    for q in quantiles:
+        index = int(np.searchsorted(cumulative, total * q / 100.0))
+        label = f"p{q:g}".replace('.', '')
+        result[label] = round(bucket_value(index) / 1000.0, 3)
+    result['max'] = round(bucket_value(int(np.flatnonzero(counts)[-1])) / 1000.0, 3)
+    return result
+
+
+_histograms = {}
+_gauges = {}
+_last_flush = 0.0
+
+
+def record(stage, seconds):
+    """Adds one latency sample (in seconds) for a pulse path stage."""
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms[stage] = LatencyHistogram()
+    histogram.record(seconds)
+
+
+def gauge(name, value):
+    """Sets a point-in-time value (exported as the latest value per process)."""
+    _gauges[name] = value
+
+
+def count(name, amount=1):
+    """Increments a per-process counter (monotonic since process start)."""
+    _gauges[name] = _gauges.get(name, 0) + amount
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def _queue_export(pipe):
+    """Queues this process's live windows onto a pipeline (one hash field per process)."""
+    now = time.time()
+    if _histograms:
+        pipe.sadd(STAGES_KEY, *_histograms)
+    for stage, histogram in _histograms.items():
+        counts = histogram.merged(now)
+        nonzero = np.flatnonzero(counts)
+        sparse = dict(zip(nonzero.tolist(), counts[nonzero].tolist()))
+        key = METRICS_KEY.format(stage=stage)
+        pipe.hset(key, PROCESS_ID, msgpack.packb({'t': now, 'c': sparse}))
+        pipe.expire(key, int(SLOT_SECONDS * WINDOW_SLOTS))
+    if _gauges:
+        pipe.hset(GAUGES_KEY, PROCESS_ID, msgpack.packb({'t': now, 'g': _gauges}))
+        pipe.expire(GAUGES_KEY, int(SLOT_SECONDS * WINDOW_SLOTS))
+
+
+def flush(r, force=False):
+    """Exports histograms with a sync Redis client (at most every FLUSH_INTERVAL)."""
+    global _last_flush
+    if not force and time.monotonic() - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = time.monotonic()
+
+    pipe = r.pipeline(transaction=False)
+    _queue_export(pipe)
+    pipe.execute()
+
+
+async def flush_forever(r):
+    """Background exporter for asyncio processes (bridge, ASGI workers)."""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            pipe = r.pipeline(transaction=False)
+            _queue_export(pipe)
+            await pipe.execute()
+        except Exception:
+            pass
+
+
+_flushers = weakref.WeakSet()
+
+
+def ensure_async_flusher(r):
+    """Starts flush_forever once per event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _flushers:
+        _flushers.add(loop)
+        asyncio.ensure_future(flush_forever(r))
+
+
+def read_stages(r, stages=None):
+    """Merges every live process's histogram per stage into percentiles (ms)."""
+    if stages is None:
+        stages = sorted(stage.decode() for stage in r.smembers(STAGES_KEY))
+
+    pipe = r.pipeline(transaction=False)
+    for stage in stages:
+        pipe.hgetall(METRICS_KEY.format(stage=stage))
+
+    cutoff = time.time() - SLOT_SECONDS * WINDOW_SLOTS
+    result = {}
+    for stage, fields in zip(stages, pipe.execute()):
+        if not fields:
+            continue # Registered, but no process exported it recently
+        counts = np.zeros(BUCKETS, dtype=np.int64)
+        for value in fields.values():
+            payload = msgpack.unpackb(value, strict_map_key=False)
+            if payload['t'] < cutoff:
+                continue # Process went away
+            for index, count in payload['c'].items():
+                counts[index] += count
+        result[stage] = percentiles(counts)
+    return result
+
+
+def read_gauges(r):
+    """{process_id: {name: value}} for every process that exported recently."""
+    cutoff = time.time() - SLOT_SECONDS * WINDOW_SLOTS
+    result = {}
+    for process, value in r.hgetall(GAUGES_KEY).items():
+        payload = msgpack.unpackb(value)
+        if payload['t'] >= cutoff:
+            result[process.decode()] = payload['g']
+    return result
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('msrp', models.DecimalField(decimal_places=2, default=100, max_digits=10)),
+                ('floor_ratio', models.FloatField(default=0.7)),
+                ('base_mass', models.FloatField(default=1.0)),
+                ('max_stock', models.PositiveIntegerField(default=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('physics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSample',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('t', models.DateTimeField()),
+                ('price', models.FloatField()),
+                ('mass', models.FloatField()),
+                ('stock', models.IntegerField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='physics.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 't'], name='physics_sample_product_t')],
+            },
+        ),
+    ]
@@ -1,3 +1,35 @@
 from django.db import models
 
-# Create your models here.
+
+class Product(models.Model):
+    """
+    Catalog entry for an orb. The live state (price, stock, mass) lives in
+    Redis; these columns are the pricing rules it is warmed from.
+    """
+    sku = models.CharField(max_length=64, unique=True) # Product ID used on the pulse path
+    name = models.CharField(max_length=200, blank=True)
+    msrp = models.DecimalField(max_digits=10, decimal_places=2, default=100)
+    floor_ratio = models.FloatField(default=0.70) # Price never drops below msrp * floor_ratio
+    base_mass = models.FloatField(default=1.0)
+    max_stock = models.PositiveIntegerField(default=100)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name or self.sku
+
+
+class PriceSample(models.Model):
+    """
+    One published state of a product (write-behind from the decay engine).
+    Kept narrow on purpose: the table grows by every change of every product.
+    """
+    id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='samples', db_index=False)
+    t = models.DateTimeField()
+    price = models.FloatField()
+    mass = models.FloatField()
+    stock = models.IntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 't'], name='physics_sample_product_t')]
@@ -0,0 +1,188 @@
+"""
+Server-Authoritative Orbital Simulation
+Integrates every orb around the Gravity Well in NumPy arrays and finds
+collisions through a uniform spatial grid (near O(N) broadphase)
+"""
+
+import numpy as np
+
+# Gravity Well (mirrors the attractor in the frontend physics worker, in px/s)
+WELL_CENTER = (400.0, 300.0)
+WELL_STRENGTH = 1.8e7     # Radial pull: a = G * strength / (r^2 + softening)
+WELL_SOFTENING = 200.0    # Prevent infinite force at distance 0
+AIR_FRICTION = 0.05       # Velocity fraction lost per second
+RESTITUTION = 0.5         # Bounciness of orb-orb collisions
+
+BASE_RADIUS = 10.0        # Orb radius at base mass (px); grows with sqrt(mass)
+
+# Grid keys pack (cell_x, cell_y) into one int64; neighbours are key offsets
+_CELL_OFFSET = 1 << 31
+_NEIGHBOURS = ((1, 0), (-1, 1), (0, 1), (1, 1)) # Half-plane: each pair is tested once
+
+
+def radius_for(mass):
+    return BASE_RADIUS * np.sqrt(np.maximum(mass, 0.1))
+
+
+class OrbitalWorld:
+    """
+    Column-oriented world state. Row i belongs to product_ids[i].
+    step() advances every orb and returns the pairs that started touching.
+    """
+
+    def __init__(self, product_ids, mass=1.0, seed=None):
+        self.product_ids = list(product_ids)
+        n = len(self.product_ids)
+        rng = np.random.default_rng(seed)
+
+        self.mass = np.broadcast_to(np.asarray(mass, dtype=np.float64), (n,)).copy()
+        self.radius = radius_for(self.mass)
+
+        # Start on a ring with (roughly) circular orbital speed
+        distance = rng.uniform(120.0, 280.0, n)
+        theta = rng.uniform(0.0, 2 * np.pi, n)
+        center = np.asarray(WELL_CENTER)
+        self.pos = center + np.column_stack((np.cos(theta), np.sin(theta))) * distance[:, None]
+        speed = np.sqrt(WELL_STRENGTH * distance / (distance ** 2 + WELL_SOFTENING))
+        self.vel = np.column_stack((-np.sin(theta), np.cos(theta))) * speed[:, None]
+
+        self._contacts = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def adopt(self, previous):
+        """Carries position/velocity over from an older world for products it already had."""
+        rows = {pid: i for i, pid in enumerate(previous.product_ids)}
+        for i, pid in enumerate(self.product_ids):
+            j = rows.get(pid)
+            if j is not None:
+                self.pos[i] = previous.pos[j]
+                self.vel[i] = previous.vel[j]
+
+    def set_mass(self, mass):
+        self.mass = np.asarray(mass, dtype=np.float64)
+        self.radius = radius_for(self.mass)
+
+    def step(self, dt, gravity=1.0):
+        """
+        Semi-implicit Euler step. Returns an (k, 2) array of row pairs whose
+        contact began this step (collisionStart semantics).
+        """
+        # 1. Radial attraction towards the well (acceleration is mass independent)
+        delta = np.asarray(WELL_CENTER) - self.pos
+        dist_sq = np.einsum('ij,ij->i', delta, delta)
+        dist = np.sqrt(dist_sq)
+        accel = gravity * WELL_STRENGTH / (dist_sq + WELL_SOFTENING)
+        unit = np.divide(delta, dist[:, None], out=np.zeros_like(delta), where=dist[:, None] > 0)
+
+        self.vel += unit * (accel * dt)[:, None]
+        self.vel *= max(0.0, 1.0 - AIR_FRICTION * dt)
+        self.pos += self.vel * dt
+
+        # 2. Broadphase + narrowphase
+        a, b = self.find_contacts()
+        if len(a):
+            self.resolve(a, b)
+
+        # 3. Only report pairs that were not already touching last step
+        keys = a.astype(np.int64) * len(self) + b
+        started = ~np.isin(keys, self._contacts, assume_unique=True)
+        self._contacts = keys
+        return np.column_stack((a[started], b[started]))
+
+    def find_contacts(self):
+        """
+        Uniform grid broadphase: bodies are bucketed into cells as large as the
+        biggest orb, so candidates only come from the same or adjacent cells.
+        Returns row arrays (a, b) with a < b of overlapping orbs.
+        """
+        n = len(self)
+        if n < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        cell_size = 2.0 * float(self.radius.max())
+        cells = np.floor(self.pos / cell_size).astype(np.int64) + _CELL_OFFSET
+        keys = (cells[:, 0] << 32) | cells[:, 1]
+
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+
+        # Same cell: every pair (i < j) inside each run of equal keys
+        pairs_a, pairs_b = [], []
+        right = np.searchsorted(sorted_keys, sorted_keys, side='right')
+        first = np.arange(n)
+        ia, ib = _expand(first, first + 1, right)
+        pairs_a.append(ia)
+        pairs_b.append(ib)
+
+        # Neighbour cells (half of them, so no pair is produced twice)
+        for dx, dy in _NEIGHBOURS:
+            target = sorted_keys + (dx << 32) + dy
+            lo = np.searchsorted(sorted_keys, target, side='left')
+            hi = np.searchsorted(sorted_keys, target, side='right')
+            ia, ib = _expand(first, lo, hi)
+            pairs_a.append(ia)
+            pairs_b.append(ib)
+
+        a = order[np.concatenate(pairs_a)]
+        b = order[np.concatenate(pairs_b)]
+
+        # Narrowphase: circle overlap
+        delta = self.pos[b] - self.pos[a]
+        reach = self.radius[a] + self.radius[b]
+        hit = np.einsum('ij,ij->i', delta, delta) < reach * reach
+        a, b = a[hit], b[hit]
+        swap = a > b
+        a[swap], b[swap] = b[swap], a[swap]
+        return a, b
+
+    def resolve(self, a, b):
+        """Separates overlapping orbs and exchanges momentum along the normal."""
+        delta = self.pos[b] - self.pos[a]
+        dist = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        dist = np.maximum(dist, 1e-6)
+        normal = delta / dist[:, None]
+        overlap = self.radius[a] + self.radius[b] - dist
+
+        inv_a = 1.0 / self.mass[a]
+        inv_b = 1.0 / self.mass[b]
+        inv_sum = inv_a + inv_b
+
+        # Positional correction, split by inverse mass
+        correction = normal * (overlap / inv_sum)[:, None]
+        self.pos += _scatter(len(self), a, -correction * inv_a[:, None], b, correction * inv_b[:, None])
+
+        # Impulse only for approaching pairs
+        closing = np.einsum('ij,ij->i', self.vel[b] - self.vel[a], normal)
+        approaching = closing < 0
+        impulse = np.where(approaching, -(1.0 + RESTITUTION) * closing / inv_sum, 0.0)
+        self.vel += _scatter(len(self), a, -normal * (impulse * inv_a)[:, None],
+                             b, normal * (impulse * inv_b)[:, None])
+
+
+def _scatter(n, a, da, b, db):
+    """Sums per-pair 2D deltas onto their rows (bincount is far cheaper than np.add.at)."""
+    rows = np.concatenate((a, b))
+    values = np.concatenate((da, db))
+    return np.column_stack((
+        np.bincount(rows, weights=values[:, 0], minlength=n),
+        np.bincount(rows, weights=values[:, 1], minlength=n),
+    ))
+
+
+def _expand(rows, lo, hi):
+    """
+    For every row i, pairs it with each index in [lo[i], hi[i]).
+    Fully vectorized (no Python loop over bodies).
+    """
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    if not total:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    a = np.repeat(rows, counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    b = np.repeat(lo, counts) + (np.arange(total) - starts)
+    return a, b
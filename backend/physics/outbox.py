@@ -0,0 +1,124 @@
+"""
+Per-connection Pulse Outbox
+Last-value-wins conflation between the channel layer and a WebSocket
+"""
+
+import asyncio
+import logging
+import time
+
+from . import metrics
+from .frames import FrameDecoder, FrameEncoder, is_frame
+from .loadshed import SHED_MOTION, strip_motion
+
+logger = logging.getLogger(__name__)
+
+
+class PulseOutbox:
+    """
+    Keeps only the newest pending state per product for one client.
+
+    Incoming frames are merged field by field into `pending`; a single sender
+    task flushes everything pending as one re-encoded frame whenever the
+    previous send has completed. A client that falls behind therefore gets the
+    latest world instead of a replay of every stale intermediate state.
+    Non-frame messages (e.g. CELESTIAL msgpack) are forwarded in order, unmerged.
+
+    A client that negotiated a lower rate gets at most `hz` flushes per
+    second. Decoders keep the last pos/vel per product and every frame is
+    stamped with its server time `t`, so the client extrapolates in between.
+
+    With a LoadMonitor the outbox also sheds load: motion fields are dropped
+    and flushes are rate limited while the worker is overloaded.
+
+    A failed send stops the outbox and calls `on_error` (the consumer closes
+    the socket), instead of leaving the client silently without pulses.
+    """
+
+    def __init__(self, send, load=None, on_error=None):
+        self._send = send
+        self.load = load
+        self._on_error = on_error
+        self._decoder = FrameDecoder()
+        self._encoder = FrameEncoder()
+        self.pending = {}
+        self.products = None
+        self._passthrough = []
+        self._latest_t = None
+        self.interval = 0.0
+        self._wake = asyncio.Event()
+        self._task = None
+        if load is not None:
+            load.register(self)
+
+    def push(self, binary_data):
+        """Merges one message from the group; never waits on the socket."""
+        if is_frame(binary_data):
+            frame = self._decoder.decode(binary_data)
+            for pid, fields in frame['updates'].items():
+                if self.products is None or pid in self.products:
+                    self.pending.setdefault(pid, {}).update(fields)
+            self._latest_t = frame['t']
+        else:
+            self._passthrough.append(binary_data)
+
+        self._wake.set()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def set_filter(self, products):
+        """Restricts the outbox to a product set (None forwards every product)."""
+        self.products = products
+        if products is not None:
+            self.pending = {pid: f for pid, f in self.pending.items() if pid in products}
+
+    def set_rate(self, hz):
+        """Caps flushes at `hz` per second (None sends as fast as the socket allows)."""
+        self.interval = 1.0 / hz if hz else 0.0
+
+    @property
+    def depth(self):
+        """Number of products (plus passthrough messages) waiting to be sent."""
+        return len(self.pending) + len(self._passthrough)
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            start = time.monotonic()
+            try:
+                await self.flush()
+            except Exception as e:
+                metrics.count('outbox.send_error')
+                logger.warning("Pulse outbox send failed, closing the client: %s", e)
+                self._task = None # close() must not cancel this task from within on_error
+                if self._on_error is not None:
+                    await self._on_error()
+                return
+
+            interval = self.interval
+            if self.load is not None:
+                interval = max(interval, self.load.min_interval)
+            remaining = interval - (time.monotonic() - start)
+            if remaining > 0:
+                # Lower effective Hz: keep merging into `pending` meanwhile
+                await asyncio.sleep(remaining)
+
+    async def flush(self):
+        """Sends everything pending right now."""
+        passthrough, self._passthrough = self._passthrough, []
+        for binary_data in passthrough:
+            await self._send(binary_data)
+
+        if self.pending:
+            pending, self.pending = self.pending, {}
+            if self.load is not None and self.load.tier >= SHED_MOTION:
+                metrics.count('shed.dropped_updates', strip_motion(pending))
+            binary_data = self._encoder.encode_updates(pending, t=self._latest_t)
+            if binary_data is not None:
+                await self._send(binary_data)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
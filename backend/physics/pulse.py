@@ -2,46 +2,56 @@ import msgpack
 import time
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from .shards import GLOBAL_GROUP, ShardedFrameEncoder, shard_group
 
-def broadcast_price_pulse(product_id, price, position=None, velocity=None):
+# One encoder per publishing process (product index space + delta state per shard)
+_encoder = ShardedFrameEncoder()
+
+
+def broadcast_pulse_frame(binary_data, group=GLOBAL_GROUP):
     """
-    Serializes state data using MessagePack and broadcasts to the global_pulse group.
+    Sends one pre-encoded binary frame to a pulse group (global_pulse by default).
     """
     channel_layer = get_channel_layer()
-    
-    # MessagePack Schema (Optimized Short Keys)
-    # id: Product UUID
-    # p: Current Price
-    # pos: Position {x, y}
-    # vel: Velocity {x, y}
-    # m: Mass
-    # t: Server Timestamp
-    payload = {
-        'id': product_id,
-        'p': float(price),
-        'm': 1.0, # Initial base mass
-        'pos': position or {'x': 0, 'y': 0},
-        'vel': velocity or {'x': 0, 'y': 0},
-        'ins': 0.0, # Instability (0.0 to 1.0) - Story 3.1
-        't': time.time()
-    }
-    
-    binary_data = msgpack.packb(payload, use_bin_type=True)
-    
+
     async_to_sync(channel_layer.group_send)(
-        "global_pulse",
+        group,
         {
             "type": "pulse.message",
             "data": binary_data,
         }
     )
 
-def broadcast_celestial_update(gravity=None, base_mass=None, force_pulse=False, product_id=None):
+
+def broadcast_pulse_batch(product_ids, columns, encoder=None):
     """
-    Broadcasts global physics constants or a Force Pulse event.
+    Encodes every product of a tick into one delta frame per shard and
+    broadcasts each frame to its shard group only.
+    `columns` maps frame fields (p, m, ins, stk, pos, vel, hits) to arrays
+    aligned with product_ids. Shards where no field changed send nothing.
     """
-    channel_layer = get_channel_layer()
-    
+    frames = (encoder or _encoder).encode(product_ids, columns)
+    for shard, binary_data in frames:
+        broadcast_pulse_frame(binary_data, group=shard_group(shard))
+    return frames
+
+
+def broadcast_price_pulse(product_id, price, position=None, velocity=None):
+    """
+    Broadcasts the state of a single product as a binary pulse frame.
+    """
+    position = position or {'x': 0, 'y': 0}
+    velocity = velocity or {'x': 0, 'y': 0}
+
+    return broadcast_pulse_batch([product_id], {
+        'p': [float(price)],
+        'pos': [[position['x'], position['y']]],
+        'vel': [[velocity['x'], velocity['y']]],
+    })
+
+
+def pack_celestial(gravity=None, base_mass=None, force_pulse=False, product_id=None):
+    """CELESTIAL msgpack message (constants and/or a Force Pulse)."""
     payload = {
         'type': 'CELESTIAL',
         'g': gravity,
@@ -50,8 +60,16 @@ def broadcast_celestial_update(gravity=None, base_mass=None, force_pulse=False,
         'pid': product_id,
         't': time.time()
     }
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def broadcast_celestial_update(gravity=None, base_mass=None, force_pulse=False, product_id=None):
+    """
+    Broadcasts global physics constants or a Force Pulse event.
+    """
+    channel_layer = get_channel_layer()
     
-    binary_data = msgpack.packb(payload, use_bin_type=True)
+    binary_data = pack_celestial(gravity, base_mass, force_pulse, product_id)
     
     async_to_sync(channel_layer.group_send)(
         "global_pulse",
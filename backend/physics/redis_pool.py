@@ -0,0 +1,52 @@
+"""
+Shared asyncio Redis client for the WebSocket consumers
+One connection pool per event loop instead of a new client per message
+"""
+
+import asyncio
+import hashlib
+import weakref
+
+import redis.asyncio as aioredis
+
+MAX_CONNECTIONS = 50
+SOCKET_TIMEOUT = 0.5 # Fail fast instead of stalling a consumer on a slow reply
+
+# asyncio pools are bound to the loop that created them
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """
+    Returns the asyncio Redis client for the running event loop.
+    All consumers in a worker share its connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        pool = aioredis.ConnectionPool(
+            host='localhost',
+            port=6379,
+            db=0,
+            max_connections=MAX_CONNECTIONS,
+            socket_timeout=SOCKET_TIMEOUT,
+            socket_connect_timeout=SOCKET_TIMEOUT,
+        )
+        client = _clients[loop] = aioredis.Redis(connection_pool=pool)
+    return client
+
+
+class PipelineScript:
+    """
+    A Lua script queued by SHA on a sync or asyncio pipeline alike.
+    The pipeline loads it (SCRIPT EXISTS / LOAD) before executing, so only
+    the SHA travels with every call.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.sha = hashlib.sha1(script.encode()).hexdigest()
+
+    def queue(self, pipe, keys=(), args=()):
+        pipe.scripts.add(self)
+        pipe.evalsha(self.sha, len(keys), *keys, *args)
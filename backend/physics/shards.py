@@ -0,0 +1,84 @@
+"""
+Pulse Sharding
+Routes each product's pulses to one of PULSE_SHARDS channel groups so clients
+only receive the slice of the catalog they are viewing
+"""
+
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from .frames import FrameEncoder
+
+PULSE_SHARDS = getattr(settings, 'PULSE_SHARDS', 16)
+
+# Unsharded traffic (CELESTIAL updates, legacy publishers) still goes here
+GLOBAL_GROUP = "global_pulse"
+
+
+def shard_for(product_id, shards=PULSE_SHARDS):
+    """Stable product -> shard mapping shared by publishers, bridge and consumers."""
+    return zlib.crc32(product_id.encode()) % shards
+
+
+def shard_group(shard):
+    """Channels group for one shard."""
+    return f"pulse.shard.{shard}"
+
+
+def shard_channel(shard):
+    """Redis Pub/Sub channel the engines publish a shard's frames to."""
+    return f"price_pulses:{shard}"
+
+
+def all_shards():
+    return range(PULSE_SHARDS)
+
+
+class ShardedFrameEncoder:
+    """
+    One FrameEncoder per shard: splits a tick's columns by shard and returns
+    a [(shard, frame_bytes)] list with one frame per shard that changed.
+    """
+
+    def __init__(self, shards=PULSE_SHARDS, **encoder_options):
+        self.shards = shards
+        self._encoder_options = encoder_options
+        self._encoders = {}
+        self._shard_ids = {}
+
+    def discard(self, shard):
+        """
+        Forgets a shard's encoder (e.g. after its ownership moved away), so a
+        later owner starts again from a fresh source and keyframe instead of
+        deltas against values clients no longer hold.
+        """
+        self._encoders.pop(shard, None)
+
+    def _shards_of(self, product_ids):
+        result = np.empty(len(product_ids), dtype=np.int64)
+        for i, pid in enumerate(product_ids):
+            shard = self._shard_ids.get(pid)
+            if shard is None:
+                shard = self._shard_ids[pid] = shard_for(pid, self.shards)
+            result[i] = shard
+        return result
+
+    def encode(self, product_ids, columns, t=None):
+        shards = self._shards_of(product_ids)
+        frames = []
+        for shard in np.unique(shards).tolist():
+            rows = np.flatnonzero(shards == shard)
+            encoder = self._encoders.get(shard)
+            if encoder is None:
+                encoder = self._encoders[shard] = FrameEncoder(**self._encoder_options)
+
+            binary_data = encoder.encode(
+                [product_ids[i] for i in rows],
+                {name: np.asarray(values)[rows] for name, values in columns.items()},
+                t=t,
+            )
+            if binary_data is not None:
+                frames.append((shard, binary_data))
+        return frames
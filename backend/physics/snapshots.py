@@ -0,0 +1,253 @@
+"""
+Compressed Session Snapshot Store
+Keeps each session's anchor zlib-compressed under a version number,
+merges delta patches (upsert/remove by body id) server-side and serves
+recoveries through a small per-process LRU
+
+Versions restart at 1 when an expired anchor is saved again, so every anchor
+hash also carries an epoch: a nonce set when the hash is created. Together
+they identify one content (ETag, cache revalidation).
+"""
+
+import secrets
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import msgpack
+from django.conf import settings
+
+SNAPSHOT_TTL = 3600
+MAX_UPLOAD_BYTES = getattr(settings, 'SNAPSHOT_MAX_UPLOAD_BYTES', 256 * 1024) # As sent (possibly compressed)
+MAX_SNAPSHOT_BYTES = getattr(settings, 'SNAPSHOT_MAX_BYTES', 1024 * 1024)    # Decompressed msgpack
+COMPRESS_LEVEL = 6
+
+CACHE_SIZE = getattr(settings, 'SNAPSHOT_CACHE_SIZE', 1024)  # Sessions held in memory per process
+CACHE_FRESH_SECONDS = 1.0 # Served without asking Redis; after that only the version is re-checked
+
+# Compare-and-set write.
+#   KEYS: snapshot hash
+#   ARGV: expected version ('' = unconditional full anchor), compressed data, ttl,
+#         new epoch, expected epoch (checked together with the expected version)
+# Returns {new version, epoch}, or {-1} when the expected anchor is no longer current
+# (same version number under another epoch = the anchor expired and was recreated).
+# The epoch is only set by the write that creates the hash.
+SAVE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'v') or '0')
+local stored = redis.call('HGET', KEYS[1], 'e')
+if ARGV[1] ~= '' and (tonumber(ARGV[1]) ~= current or (stored or '0') ~= ARGV[5]) then
+    return {-1}
+end
+local version = current + 1
+local epoch = stored or ARGV[4]
+redis.call('HSET', KEYS[1], 'v', version, 'z', ARGV[2], 'e', epoch)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return {version, epoch}
+"""
+
+
+class SnapshotError(Exception):
+    status_code = 400
+
+
+class SnapshotTooLarge(SnapshotError):
+    status_code = 413
+
+
+class SnapshotConflict(SnapshotError):
+    """The patch base is not the stored version; the client must resend a full anchor."""
+    status_code = 409
+
+    def __init__(self, version):
+        super().__init__(f"Snapshot base is stale (current version {version})")
+        self.version = version
+
+
+def snapshot_key(session_id):
+    return f"sc:session:anchor:{session_id}"
+
+
+def decode_upload(raw_data, encoding=None):
+    """
+    Inflates a gzip/deflate upload with a hard output limit (no zip bombs)
+    and unpacks the msgpack payload.
+    """
+    if len(raw_data) > MAX_UPLOAD_BYTES:
+        raise SnapshotTooLarge(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding in ('gzip', 'deflate'):
+        # wbits: 16+ for gzip, 32+ auto-detects zlib vs gzip headers
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == 'gzip' else 32 + zlib.MAX_WBITS)
+        try:
+            raw_data = inflater.decompress(raw_data, MAX_SNAPSHOT_BYTES)
+        except zlib.error:
+            raise SnapshotError("Upload is not valid compressed data")
+        if inflater.unconsumed_tail:
+            raise SnapshotTooLarge(f"Snapshot exceeds {MAX_SNAPSHOT_BYTES} bytes")
+    elif encoding != 'identity':
+        raise SnapshotError(f"Unsupported Content-Encoding: {encoding}")
+
+    if len(raw_data) > MAX_SNAPSHOT_BYTES:
+        raise SnapshotTooLarge(f"Snapshot exceeds {MAX_SNAPSHOT_BYTES} bytes")
+    try:
+        return msgpack.unpackb(raw_data, strict_map_key=False)
+    except Exception:
+        raise SnapshotError("Upload is not valid msgpack")
+
+
+def _has_id(body):
+    return isinstance(body, dict) and isinstance(body.get('id'), (str, int, float, bytes))
+
+
+def check_bodies(bodies):
+    """A full anchor is a list of maps, each with a scalar 'id' (what patches match on)."""
+    if not isinstance(bodies, list):
+        raise SnapshotError("A full anchor must be a list of bodies")
+    if not all(_has_id(body) for body in bodies):
+        raise SnapshotError("Every body needs an 'id'")
+
+
+def apply_patch(bodies, patch):
+    """
+    Merges a {'upsert': [...], 'remove': [...]} patch into a body list.
+    Upserted bodies are matched by 'id' and merged field by field; order is kept.
+    """
+    if not isinstance(patch, dict):
+        raise SnapshotError("Patch must be a map with 'upsert' and/or 'remove'")
+
+    check_bodies(bodies)
+    merged = {body['id']: body for body in bodies}
+    for body in patch.get('upsert') or ():
+        if not _has_id(body):
+            raise SnapshotError("Every upserted body needs an 'id'")
+        merged.setdefault(body['id'], {}).update(body)
+    for body_id in patch.get('remove') or ():
+        if not _has_id({'id': body_id}):
+            raise SnapshotError("Removed ids must be strings or numbers")
+        merged.pop(body_id, None)
+    return list(merged.values())
+
+
+class SnapshotCache:
+    """
+    Bounded LRU of decompressed anchors: session_id -> (version, packed, epoch, checked_at).
+    Shared by every request thread of a worker process.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+            return entry
+
+    def put(self, session_id, version, packed, epoch):
+        with self._lock:
+            self._entries[session_id] = (version, packed, epoch, time.monotonic())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+_cache = SnapshotCache()
+
+
+class SnapshotStore:
+    """Full anchors and delta patches; one CAS script call per write."""
+
+    def __init__(self, r, cache=_cache):
+        self.r = r
+        self.cache = cache
+        self.save_script = r.register_script(SAVE_SCRIPT)
+
+    def version(self, session_id):
+        return int(self.r.hget(snapshot_key(session_id), 'v') or 0)
+
+    def revision(self, session_id):
+        """(version, epoch) of the stored anchor, without its payload."""
+        version, epoch = self.r.hmget(snapshot_key(session_id), ('v', 'e'))
+        return int(version or 0), _epoch(epoch)
+
+    def load_cached(self, session_id):
+        """
+        load() behind the process LRU. A fresh entry costs nothing; a stale one
+        costs one HMGET of the version and epoch, and the payload is only
+        re-fetched and inflated when either moved.
+        """
+        entry = self.cache.get(session_id)
+        if entry is not None:
+            version, packed, epoch, checked_at = entry
+            if time.monotonic() - checked_at < CACHE_FRESH_SECONDS:
+                return version, packed, epoch
+            if self.revision(session_id) == (version, epoch):
+                self.cache.put(session_id, version, packed, epoch)
+                return version, packed, epoch
+
+        version, packed, epoch = self.load(session_id)
+        if packed is None:
+            self.cache.discard(session_id)
+        else:
+            self.cache.put(session_id, version, packed, epoch)
+        return version, packed, epoch
+
+    def load(self, session_id):
+        """Returns (version, packed msgpack, epoch) or (0, None, None) when no anchor exists."""
+        version, compressed, epoch = self.r.hmget(snapshot_key(session_id), ('v', 'z', 'e'))
+        if compressed is None:
+            return 0, None, None
+        return int(version), zlib.decompress(compressed), _epoch(epoch)
+
+    def save(self, session_id, bodies):
+        """Stores a full anchor unconditionally. Returns the new version."""
+        check_bodies(bodies)
+        return self._write(session_id, bodies, expected='')
+
+    def patch(self, session_id, base_version, patch):
+        """
+        Applies a delta to the anchor at base_version. Returns the new version.
+        The write is conditional on the version and the epoch of the content
+        the patch was merged into, so a cached anchor that expired and was
+        recreated in the meantime is rejected instead of resurrected.
+        """
+        entry = self.cache.get(session_id)
+        if entry is not None and entry[0] == base_version:
+            version, packed, epoch = entry[0], entry[1], entry[2]
+        else:
+            version, packed, epoch = self.load(session_id)
+        if packed is None or version != base_version:
+            raise SnapshotConflict(version)
+        bodies = apply_patch(msgpack.unpackb(packed, strict_map_key=False), patch)
+        return self._write(session_id, bodies, expected=base_version, epoch=epoch)
+
+    def _write(self, session_id, bodies, expected, epoch=''):
+        packed = msgpack.packb(bodies)
+        if len(packed) > MAX_SNAPSHOT_BYTES:
+            raise SnapshotTooLarge(f"Snapshot exceeds {MAX_SNAPSHOT_BYTES} bytes")
+
+        reply = self.save_script(
+            keys=[snapshot_key(session_id)],
+            args=[expected, zlib.compress(packed, COMPRESS_LEVEL), SNAPSHOT_TTL, secrets.token_hex(4), epoch],
+        )
+        if reply[0] < 0:
+            # Another anchor landed between our read and the write (or ours expired)
+            self.cache.discard(session_id)
+            raise SnapshotConflict(self.version(session_id))
+        version, epoch = reply[0], _epoch(reply[1])
+        self.cache.put(session_id, version, packed, epoch)
+        return version
+
+
+def _epoch(raw):
+    """Epoch as stored (anchors written before epochs existed read as '0')."""
+    return raw.decode() if raw else '0'
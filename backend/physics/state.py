@@ -0,0 +1,240 @@
+"""
+Batch State Store for the Decay Engine
+Reads the hot state of every product in one pipelined round trip and
+writes it back through one atomic server-side script per tick
+"""
+
+import numpy as np
+
+from .decay import FLOOR_RATIO, CatalogState
+from .interactions import HITS_TTL
+from .transport import PULSE_TRANSPORT, STREAM, STREAM_MAXLEN, queue_publish, stream_key
+
+CATALOG_KEY = "sc:prod:catalog"
+CATALOG_VERSION_KEY = "sc:prod:catalog:version" # Bumped by warm_catalog on every publish
+META_FIELDS = ('msrp', 'floor_ratio', 'base_mass', 'max_stock')
+
+# Write-back script.
+#   KEYS: `nfence` shard leases, then per product: price, mass, stock, hits
+#   ARGV: lease token, nfence, then per product: price, mass, stock_delta
+# Sets price/mass, consumes stock (never below 0) and drains the hit counter
+# in the same atomic step so no PulseConsumer increment is lost between reads.
+# Writes nothing (returns false) when any lease is no longer held by the token,
+# so a worker that lost its shards can never decay them twice.
+COMMIT_SCRIPT = """
+local nfence = tonumber(ARGV[2])
+for i = 1, nfence do
+    if redis.call('GET', KEYS[i]) ~= ARGV[1] then
+        return false
+    end
+end
+
+local hits = {}
+for i = 1, (#ARGV - 2) / 3 do
+    local k = nfence + (i - 1) * 4
+    local a = 2 + (i - 1) * 3
+    redis.call('SET', KEYS[k + 1], ARGV[a + 1])
+    redis.call('SET', KEYS[k + 2], ARGV[a + 2])
+    local delta = tonumber(ARGV[a + 3])
+    if delta > 0 then
+        if redis.call('DECRBY', KEYS[k + 3], delta) < 0 then
+            redis.call('SET', KEYS[k + 3], 0)
+        end
+    end
+    hits[i] = tonumber(redis.call('GET', KEYS[k + 4]) or '0')
+    redis.call('DEL', KEYS[k + 4])
+end
+return hits
+"""
+
+# Publish script (fenced writers only).
+#   KEYS: shard leases
+#   ARGV: lease token, stream maxlen ('' = Pub/Sub), then channel/stream, data pairs
+# Publishes the tick's frames only while every lease is still held.
+PUBLISH_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('GET', KEYS[i]) ~= ARGV[1] then
+        return 0
+    end
+end
+for i = 3, #ARGV, 2 do
+    if ARGV[2] == '' then
+        redis.call('PUBLISH', ARGV[i], ARGV[i + 1])
+    else
+        redis.call('XADD', ARGV[i], 'MAXLEN', '~', ARGV[2], '*', 'd', ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+
+def catalog_ids(r, fallback=()):
+    """Sorted product IDs of the live catalog (or the fallback IDs when it is empty)."""
+    members = r.smembers(CATALOG_KEY)
+    return sorted(m.decode() for m in members) if members else list(fallback)
+
+
+def catalog_version(r):
+    return int(r.get(CATALOG_VERSION_KEY) or 0)
+
+
+def meta_key(product_id):
+    return f"sc:prod:meta:{product_id}"
+
+
+def price_key(product_id):
+    return f"sc:prod:price:{product_id}"
+
+
+def mass_key(product_id):
+    return f"sc:prod:mass:{product_id}"
+
+
+def stock_key(product_id):
+    return f"sc:prod:stock:{product_id}"
+
+
+def hits_key(product_id):
+    return f"sc:prod:hits:{product_id}"
+
+
+class StateStore:
+    """
+    Redis I/O layer for CatalogState.
+    Every method costs a constant number of round trips regardless of catalog size.
+    """
+
+    def __init__(self, r, chunk_size=5000, transport=PULSE_TRANSPORT):
+        self.r = r
+        self.transport = transport
+        # Bounds the argument count of a single script call on huge catalogs
+        self.chunk_size = chunk_size
+        self.commit_script = r.register_script(COMMIT_SCRIPT)
+        self.publish_script = r.register_script(PUBLISH_SCRIPT)
+
+    def build_state(self, product_ids, msrp, max_stock):
+        """
+        CatalogState with per-product pricing rules from the sc:prod:meta hashes.
+        Products without meta (not warmed yet) fall back to the given defaults.
+        """
+        meta = []
+        for start in range(0, len(product_ids), self.chunk_size):
+            pipe = self.r.pipeline(transaction=False)
+            for pid in product_ids[start:start + self.chunk_size]:
+                pipe.hmget(meta_key(pid), META_FIELDS)
+            meta += pipe.execute()
+
+        n = len(product_ids)
+        columns = list(zip(*meta)) if meta else [()] * len(META_FIELDS)
+        defaults = (np.full(n, msrp), np.full(n, FLOOR_RATIO), np.ones(n), np.full(n, max_stock))
+        msrp, floor_ratio, base_mass, max_stock = (
+            _to_array(column, default, np.float64) for column, default in zip(columns, defaults)
+        )
+        return CatalogState(product_ids, msrp=msrp, max_stock=max_stock.astype(np.int64),
+                            base_mass=base_mass, floor_ratio=floor_ratio)
+
+    def ensure(self, state):
+        """Creates missing price/stock keys so checkout always sees a value."""
+        pipe = self.r.pipeline(transaction=False)
+        for i, pid in enumerate(state.product_ids):
+            pipe.set(price_key(pid), float(state.msrp[i]), nx=True)
+            pipe.set(stock_key(pid), int(state.max_stock[i]), nx=True)
+        pipe.execute()
+
+    def load(self, state):
+        """Refreshes price, mass and stock columns with one pipelined MGET batch."""
+        ids = state.product_ids
+        pipe = self.r.pipeline(transaction=False)
+        pipe.mget([price_key(pid) for pid in ids])
+        pipe.mget([mass_key(pid) for pid in ids])
+        pipe.mget([stock_key(pid) for pid in ids])
+        prices, masses, stocks = pipe.execute()
+
+        state.price = _to_array(prices, state.msrp, np.float64)
+        state.mass = _to_array(masses, state.base_mass, np.float64)
+        state.stock = _to_array(stocks, state.max_stock, np.int64)
+
+    def commit(self, state, stock_delta, messages=(), fence=None, hits=None):
+        """
+        Writes the tick back atomically and publishes the given
+        (channel, data) messages in the same round trip.
+        With a (token, lease_keys) fence, nothing is written or published
+        unless every lease is still held; None is returned in that case and
+        no hit is lost: the `hits` this tick applied (for rows not written)
+        and any hits already drained (for rows written) go back to Redis.
+        Returns the hits drained by the script, aligned with the state rows.
+        """
+        ids = state.product_ids
+        messages = list(messages)
+        token, leases = fence or ('', [])
+        pipe = self.r.pipeline(transaction=False)
+
+        for start in range(0, len(ids), self.chunk_size):
+            stop = start + self.chunk_size
+            keys, args = list(leases), [token, len(leases)]
+            for i, pid in enumerate(ids[start:stop], start):
+                keys += [price_key(pid), mass_key(pid), stock_key(pid), hits_key(pid)]
+                args += [float(state.price[i]), float(state.mass[i]), int(stock_delta[i])]
+            self.commit_script(keys=keys, args=args, client=pipe)
+
+        if fence is None:
+            for channel, data in messages:
+                queue_publish(pipe, channel, data, self.transport)
+            published = len(messages)
+        else:
+            stream = self.transport == STREAM
+            args = [token, STREAM_MAXLEN if stream else '']
+            for channel, data in messages:
+                args += [stream_key(channel) if stream else channel, data]
+            published = 1 if messages else 0
+            if published:
+                self.publish_script(keys=leases, args=args, client=pipe)
+
+        results = pipe.execute()
+        chunks = results[:len(results) - published]
+        if any(chunk is None for chunk in chunks):
+            restore = np.zeros(len(ids), dtype=np.int64)
+            for n, chunk in enumerate(chunks):
+                rows = slice(n * self.chunk_size, (n + 1) * self.chunk_size)
+                if chunk is not None:
+                    restore[rows] = chunk
+                elif hits is not None:
+                    restore[rows] = hits[rows]
+            self.restore_hits(ids, restore)
+            return None
+        return np.array([h for chunk in chunks for h in chunk], dtype=np.int64)
+
+    def restore_hits(self, product_ids, hits):
+        """
+        Adds hits that were drained but never applied back onto the
+        per-product counters (lease lost, shard handed off, shutdown), so
+        whoever commits the product next drains them again.
+        """
+        pipe = self.r.pipeline(transaction=False)
+        restored = 0
+        for pid, count in zip(product_ids, hits):
+            if count > 0:
+                pipe.incrby(hits_key(pid), int(count))
+                pipe.expire(hits_key(pid), HITS_TTL)
+                restored += 1
+        if restored:
+            pipe.execute()
+        return restored
+
+
+def read_masses(r, product_ids, default=1.0):
+    """Communal mass per product (as written by the decay engine) in one MGET."""
+    raw = r.mget([mass_key(pid) for pid in product_ids]) if product_ids else []
+    return _to_array(raw, np.full(len(product_ids), default), np.float64)
+
+
+def _to_array(raw_values, defaults, dtype):
+    """Converts a list of Redis replies into an array, filling gaps from defaults."""
+    values = np.array(
+        [float(v) if v is not None else np.nan for v in raw_values],
+        dtype=np.float64,
+    )
+    missing = np.isnan(values)
+    if missing.any():
+        values[missing] = np.asarray(defaults, dtype=np.float64)[missing]
+    return values.astype(dtype)
@@ -1,3 +1,170 @@
-from django.test import TestCase
+from itertools import combinations
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from physics.decay import (
+    FLOOR_RATIO, INSTABILITY_TIERS, INTERACTION_DECAY, MASS_PER_HIT, MASS_RELAXATION,
+    TEMPORAL_DECAY, CatalogState, decay_tick,
+)
+from physics.frames import FrameDecoder, FrameEncoder
+from physics.orbital import OrbitalWorld
+
+
+def reference_tick(price, mass, stock, hits, msrp, max_stock, base_mass):
+    """The engine's original per-product loop, one scalar product at a time."""
+    price = max(price - (TEMPORAL_DECAY + hits * INTERACTION_DECAY), msrp * FLOOR_RATIO)
+    mass = mass + hits * MASS_PER_HIT
+    mass = max(base_mass, mass - (mass - base_mass) * MASS_RELAXATION)
+    if hits > 0 and stock > 0:
+        stock -= 1
+
+    instability = 0.0
+    stock_pct = stock * 100.0 / max(max_stock, 1)
+    if stock == 1:
+        instability = 1.0
+    else:
+        for pct, level in INSTABILITY_TIERS:
+            if stock_pct <= pct:
+                instability = level
+                break
+    return price, mass, stock, instability
+
+
+class DecayTickTests(SimpleTestCase):
+    """decay_tick against the scalar per-product reference."""
+
+    def test_matches_scalar_reference(self):
+        rng = np.random.default_rng(7)
+        n = 64
+        msrp = rng.uniform(5.0, 500.0, n)
+        max_stock = rng.integers(1, 40, n)
+        base_mass = rng.uniform(0.5, 3.0, n)
+        state = CatalogState([f"p{i}" for i in range(n)], msrp, max_stock, base_mass=base_mass)
+        rows = [(msrp[i], base_mass[i], int(max_stock[i]), 0.0) for i in range(n)]
+
+        for _ in range(50):
+            hits = rng.integers(0, 4, n) * (rng.random(n) < 0.3)
+            stock_delta, changed = decay_tick(state, hits)
+            for i in range(n):
+                stock = rows[i][2]
+                rows[i] = reference_tick(*rows[i][:3], int(hits[i]), msrp[i], int(max_stock[i]), base_mass[i])
+                self.assertEqual(stock_delta[i], stock - rows[i][2])
+                if hits[i]:
+                    self.assertTrue(changed[i])
+
+        np.testing.assert_allclose(state.price, [row[0] for row in rows])
+        np.testing.assert_allclose(state.mass, [row[1] for row in rows])
+        np.testing.assert_array_equal(state.stock, [row[2] for row in rows])
+        np.testing.assert_array_equal(state.instability, [row[3] for row in rows])
+
+    def test_price_stops_at_the_floor(self):
+        state = CatalogState(['nebula'], 100.0, 10)
+        for _ in range(1000):
+            decay_tick(state, [3])
+        self.assertAlmostEqual(state.price[0], 100.0 * FLOOR_RATIO)
+        self.assertEqual(state.stock[0], 0)
+
+
+class FrameCodecTests(SimpleTestCase):
+    """FrameEncoder -> FrameDecoder round trips: keyframe, deltas, periodic keyframe."""
+
+    def setUp(self):
+        self.encoder = FrameEncoder(keyframe_every=5.0, source=42)
+        self.decoder = FrameDecoder()
+        self.ids = ['nebula', 'quasar', 'pulsar']
+        self.columns = {
+            'p': np.array([100.0, 20.0, 7.25]),
+            'stk': np.array([5, 1, 9]),
+            'pos': np.array([[0.5, -1.0], [2.0, 3.5], [-4.0, 0.25]]),
+        }
+
+    def decode(self, t):
+        return self.decoder.decode(self.encoder.encode(self.ids, self.columns, t=t))
+
+    def test_first_frame_is_a_full_keyframe(self):
+        frame = self.decode(0.0)
+        self.assertTrue(frame['keyframe'])
+        self.assertEqual((frame['source'], frame['seq'], frame['t']), (42, 1, 0.0))
+        self.assertEqual(frame['updates']['quasar'], {'p': 20.0, 'stk': 1, 'pos': {'x': 2.0, 'y': 3.5}})
+        self.assertEqual(set(frame['updates']), set(self.ids))
+
+    def test_delta_carries_only_changed_fields(self):
+        self.decode(0.0)
+        self.columns['p'] = np.array([100.0, 18.5, 7.25])
+        self.columns['pos'] = self.columns['pos'].copy()
+        self.columns['pos'][2] = [-3.0, 0.25]
+        frame = self.decode(1.0)
+        self.assertFalse(frame['keyframe'])
+        self.assertEqual(frame['seq'], 2)
+        self.assertEqual(frame['updates'], {
+            'quasar': {'p': 18.5},
+            'pulsar': {'pos': {'x': -3.0, 'y': 0.25}},
+        })
+
+    def test_unchanged_tick_encodes_nothing(self):
+        self.decode(0.0)
+        self.assertIsNone(self.encoder.encode(self.ids, self.columns, t=1.0))
+
+    def test_new_product_joins_the_dictionary_in_a_delta(self):
+        self.decode(0.0)
+        frame = self.decoder.decode(self.encoder.encode(['comet'], {'p': np.array([3.0])}, t=1.0))
+        self.assertFalse(frame['keyframe'])
+        self.assertEqual(frame['updates'], {'comet': {'p': 3.0}})
+
+    def test_keyframe_again_after_the_interval(self):
+        self.decode(0.0)
+        self.columns['stk'] = np.array([4, 1, 9])
+        self.assertFalse(self.decode(4.9)['keyframe'])
+
+        frame = self.decode(5.0)
+        self.assertTrue(frame['keyframe'])
+        self.assertEqual(frame['updates']['nebula'], {'p': 100.0, 'stk': 4, 'pos': {'x': 0.5, 'y': -1.0}})
+        self.assertEqual(set(frame['updates']), set(self.ids))
+
+        # A decoder joining on that keyframe sees the same state
+        late = FrameDecoder().decode(self.encoder.encode(self.ids, self.columns, t=10.0))
+        self.assertEqual(late['updates'], frame['updates'])
+
+
+def brute_force_contacts(world):
+    """Every overlapping pair (a < b), testing all n^2 / 2 of them."""
+    pairs = set()
+    for a, b in combinations(range(len(world)), 2):
+        reach = world.radius[a] + world.radius[b]
+        if np.sum((world.pos[b] - world.pos[a]) ** 2) < reach * reach:
+            pairs.add((a, b))
+    return pairs
+
+
+class OrbitalContactTests(SimpleTestCase):
+    """Grid broadphase in OrbitalWorld.find_contacts against brute-force pairs."""
+
+    def contacts(self, world):
+        a, b = world.find_contacts()
+        pairs = list(zip(a.tolist(), b.tolist()))
+        self.assertEqual(len(pairs), len(set(pairs)), "a pair was reported twice")
+        return set(pairs)
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(11)
+        for trial in range(20):
+            n = int(rng.integers(2, 300))
+            world = OrbitalWorld([f"p{i}" for i in range(n)], mass=rng.uniform(0.2, 9.0, n), seed=trial)
+            # Crowd the orbs (straddling the origin, so cells go negative too)
+            world.pos = rng.uniform(-150.0, 150.0, (n, 2))
+            contacts = self.contacts(world)
+            self.assertEqual(contacts, brute_force_contacts(world))
+            self.assertTrue(all(a < b for a, b in contacts))
+
+    def test_no_contacts_for_a_single_orb(self):
+        world = OrbitalWorld(['nebula'], seed=1)
+        self.assertEqual(self.contacts(world), set())
+
+    def test_step_reports_a_contact_only_when_it_starts(self):
+        world = OrbitalWorld(['nebula', 'quasar'], seed=1)
+        world.pos = np.array([[400.0, 300.0], [405.0, 300.0]])
+        world.vel = np.zeros((2, 2))
+        self.assertEqual(world.step(0.0).tolist(), [[0, 1]])
+        world.pos = np.array([[400.0, 300.0], [405.0, 300.0]])
+        self.assertEqual(len(world.step(0.0)), 0)
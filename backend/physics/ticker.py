@@ -0,0 +1,80 @@
+"""
+Fixed-rate Tick Scheduler
+Monotonic-deadline loop shared by the simulation commands: the period holds
+however long each tick's work takes, and late ticks are measured and counted
+
+Overrun policies (a tick's work ran past one or more deadlines):
+    skip      drop the missed ticks and realign to the next deadline
+    catchup   run the missed ticks back to back (at most MAX_CATCHUP), so
+              per-tick steps (decay, integration) keep up with wall time
+
+Exported per loop name (see metrics):
+    <name>.duration   work time of one tick (histogram)
+    <name>.jitter     how late a tick started after its deadline (histogram)
+    <name>.overrun    ticks whose deadline had already passed (counter)
+    <name>.skipped    ticks dropped by the skip policy or the catch-up cap (counter)
+"""
+
+import time
+
+from . import metrics
+
+SKIP = 'skip'
+CATCHUP = 'catchup'
+POLICIES = (SKIP, CATCHUP)
+MAX_CATCHUP = 5 # Missed ticks replayed at most; anything older is skipped
+
+
+class Ticker:
+    """
+    Iterate to run a loop at a fixed rate:
+
+        for tick in Ticker(0.2, name='decay'):
+            ...
+
+    Each iteration yields the tick number and returns once its deadline
+    (start + n x interval on the monotonic clock) has been reached, so work
+    time is absorbed instead of added to the period.
+    """
+
+    def __init__(self, interval, name='tick', policy=SKIP, max_catchup=MAX_CATCHUP):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overrun policy: {policy}")
+        self.interval = interval
+        self.name = name
+        self.policy = policy
+        self.max_catchup = max_catchup
+        self.tick = 0
+        self.deadline = None
+        self._started = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now
+        else:
+            metrics.record(f"{self.name}.duration", now - self._started)
+            self.deadline += self.interval
+            self._wait(now)
+
+        self._started = time.monotonic()
+        metrics.record(f"{self.name}.jitter", max(0.0, self._started - self.deadline))
+        tick, self.tick = self.tick, self.tick + 1
+        return tick
+
+    def _wait(self, now):
+        if now < self.deadline:
+            time.sleep(self.deadline - now)
+            return
+
+        # Overrun: the work (or the machine) ran past this deadline
+        metrics.count(f"{self.name}.overrun")
+        missed = int((now - self.deadline) // self.interval)
+        if self.policy == CATCHUP:
+            missed = max(0, missed - self.max_catchup) # Replay the rest back to back
+        if missed:
+            metrics.count(f"{self.name}.skipped", missed)
+            self.deadline += missed * self.interval
@@ -0,0 +1,67 @@
+"""
+Pulse Transport
+How the engines hand frames to the bridge: fire-and-forget Pub/Sub (default)
+or capped Redis Streams read through a consumer group, acknowledged once
+forwarded and replayed after a bridge restart
+
+Stream layout: one stream per pulse channel (sc:stream:price_pulses:<shard>),
+trimmed to about PULSE_STREAM_MAXLEN entries, each entry {d: frame bytes}.
+"""
+
+from django.conf import settings
+
+from .frames import HEADER, is_frame
+
+PUBSUB = 'pubsub'
+STREAM = 'stream'
+TRANSPORTS = (PUBSUB, STREAM)
+
+PULSE_TRANSPORT = getattr(settings, 'PULSE_TRANSPORT', PUBSUB)
+STREAM_MAXLEN = getattr(settings, 'PULSE_STREAM_MAXLEN', 10_000) # Per stream, approximate (MAXLEN ~)
+STREAM_PREFIX = "sc:stream:"
+STREAM_GROUP = "bridge"
+STREAM_FIELD = b'd'
+
+
+def stream_key(channel):
+    return f"{STREAM_PREFIX}{channel}"
+
+
+def channel_of(stream):
+    """Pulse channel a stream key carries (inverse of stream_key)."""
+    stream = stream.decode() if isinstance(stream, bytes) else stream
+    return stream[len(STREAM_PREFIX):]
+
+
+def queue_publish(pipe, channel, data, transport=PULSE_TRANSPORT):
+    """Queues one frame on a pipeline with the selected transport."""
+    if transport == STREAM:
+        pipe.xadd(stream_key(channel), {STREAM_FIELD: data}, maxlen=STREAM_MAXLEN, approximate=True)
+    else:
+        pipe.publish(channel, data)
+
+
+class SequenceTracker:
+    """
+    Gap detection on frame headers: every encoder stamps its frames with a
+    source id and a consecutive seq, so a jump means frames were lost between
+    the publisher and here (Pub/Sub drop, stream trimmed before it was read).
+    """
+
+    def __init__(self):
+        self.last = {}
+
+    def observe(self, data):
+        """Returns how many frames of this frame's source went missing before it."""
+        if not is_frame(data):
+            return 0
+        _, _, _, _, source, seq, _, _ = HEADER.unpack_from(data, 0)
+        previous = self.last.get(source)
+        if previous is None:
+            self.last[source] = seq
+            return 0
+        missed = (seq - previous - 1) & 0xFFFFFFFF
+        if missed >= 0x80000000:
+            return 0 # Duplicate or replayed frame (older than the last one seen)
+        self.last[source] = seq
+        return missed
@@ -1,3 +1,4 @@
+from django.urls import path
 from .views import SnapshotHandshakeView, RecoverSnapshotView, CelestialControlView, CelestialMetricsView
 
 urlpatterns = [
@@ -4,34 +4,68 @@ from django.http import HttpResponse
 from rest_framework import status
 import redis
 import msgpack
+import time
+from . import heatmap, metrics
+from .snapshots import SnapshotError, SnapshotConflict, SnapshotStore, decode_upload
 
 r = redis.Redis(host='localhost', port=6379, db=0)
 
 class SnapshotHandshakeView(APIView):
     """
-    Saves a binary snapshot of all orbs into Redis.
+    Saves a binary snapshot of all orbs into Redis (compressed, versioned).
+    Body: msgpack, optionally gzip/deflate (Content-Encoding).
+    Without X-Snapshot-Base it is a full anchor (list of bodies); with it, a
+    {'upsert': [...], 'remove': [...]} patch against that version.
     """
     def post(self, request):
         session_id = request.headers.get('X-Session-ID', 'default_session')
-        # Access raw body for potential binary data
-        raw_data = request.body
-        
-        # We store the raw binary directly for speed
-        r.set(f"sc:session:snapshot:{session_id}", raw_data, ex=3600)
-        
-        return Response({'status': 'anchored', 'session_id': session_id})
+        base_version = request.headers.get('X-Snapshot-Base')
+        store = SnapshotStore(r)
+
+        try:
+            payload = decode_upload(request.body, request.headers.get('Content-Encoding'))
+            if base_version:
+                version = store.patch(session_id, int(base_version), payload)
+            else:
+                version = store.save(session_id, payload)
+        except SnapshotConflict as e:
+            return Response({'error': str(e), 'version': e.version}, status=e.status_code)
+        except SnapshotError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        except ValueError:
+            return Response({'error': 'Invalid X-Snapshot-Base'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'status': 'anchored', 'session_id': session_id, 'version': version})
 
 class RecoverSnapshotView(APIView):
     """
-    Retrieves the last binary 'Anchor' from Redis.
+    Retrieves the last binary 'Anchor' (raw msgpack) for a session.
+    ETag is the snapshot epoch + version; a matching If-None-Match returns 304 with no body.
     """
     def get(self, request):
         session_id = request.query_params.get('session_id', 'default_session')
-        packed_data = r.get(f"sc:session:snapshot:{session_id}")
-        
+        version, packed_data, epoch = SnapshotStore(r).load_cached(session_id)
+
         if not packed_data:
             return HttpResponse(status=404)
-        
+
+        etag = f'"{epoch}-v{version}"'
+        if etag in _etags(request.headers.get('If-None-Match')):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(packed_data, content_type='application/x-msgpack')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache' # Always revalidate; 304s are nearly free
+        return response
+
+
+def _etags(header):
+    """Entity tags listed in an If-None-Match header (weak tags compare equal)."""
+    if not header:
+        return ()
+    return [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+from .config import update_config
 from .pulse import broadcast_celestial_update
 
 class CelestialControlView(APIView):
@@ -49,11 +83,15 @@ class CelestialControlView(APIView):
         force_pulse = request.data.get('force_pulse', False)
         product_id = request.data.get('product_id') # For specific item pulse
         
-        # Persistence in Redis
-        if gravity is not None:
-            r.set("sc:phys:gravity", gravity)
-        if base_mass is not None:
-            r.set("sc:phys:base_mass", base_mass)
+        # Persistence in Redis: one versioned record; engines reload on the invalidation message
+        changes = {name: request.data.get(name) for name in ('mass_per_hit', 'temporal_decay', 'interaction_decay')}
+        changes.update(gravity=gravity, base_mass=base_mass)
+        changes = {name: value for name, value in changes.items() if value is not None}
+        if changes:
+            try:
+                update_config(r, **changes)
+            except (TypeError, ValueError):
+                return Response({'error': 'Celestial constants must be numeric'}, status=status.HTTP_400_BAD_REQUEST)
             
         # Broadcast the update to all clients
         broadcast_celestial_update(
@@ -70,24 +108,30 @@ class CelestialMetricsView(APIView):
     Returns real-time metrics for Mission Control.
     """
     def get(self, request):
-        # Fetch interaction heatmap from Sorted Set (Top 5)
-        # Result format: [('prod_id', score), ...]
-        raw_interactions = r.zrevrange("sc:prod:interactions", 0, 4, withscores=True)
-        interactions = []
-        for pid, score in raw_interactions:
-            interactions.append({
-                'id': pid.decode() if isinstance(pid, bytes) else pid,
-                'hits': int(score)
-            })
+        # Interaction heatmap: heaviest hitters over a sliding window
+        # ?k=5 (max heatmap.TOP_CAPACITY) and ?window=10s|1m|5m
+        window = request.query_params.get('window', heatmap.DEFAULT_WINDOW)
+        if window not in heatmap.WINDOWS:
+            return Response({'error': f"window must be one of {', '.join(heatmap.WINDOWS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            k = int(request.query_params.get('k', 5))
+        except ValueError:
+            return Response({'error': 'k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        interactions = [{'id': pid, 'hits': hits} for pid, hits in heatmap.top(r, k=k, window=window)]
             
-        # [Simulated] Decay Latency
-        # In a real system, we'd pull these from a Redis TS or specific latency keys
-        latency = r.get("sc:phys:last_latency")
-        latency_val = float(latency) if latency else 1.2
+        # Per-stage latency percentiles (ms) merged across every process
+        stages = metrics.read_stages(r)
+        e2e = stages.get('pulse.e2e', {})
+        latency_val = e2e.get('p50', 0.0)
             
         return Response({
             'heatmap': interactions,
+            'window': window,
             'latency': latency_val,
+            'stages': stages,
+            'workers': metrics.read_gauges(r), # Load shedding tier, loop lag, outbox depth
             'timestamp': time.time()
         })
 
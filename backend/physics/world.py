@@ -0,0 +1,112 @@
+"""
+World-state Keyframes
+The bridge mirrors the encoder state of every publisher it forwards and
+keeps their keyframes per shard in Redis; new sockets get those as their
+first message instead of waiting for every product to pulse again
+"""
+
+import asyncio
+import time
+import weakref
+
+import msgpack
+
+from .frames import FrameMirror, frame_source
+
+WORLD_KEY = "sc:pulse:world"  # shard -> msgpack list of keyframes (one per publisher)
+PUBLISH_INTERVAL = 0.2        # Seconds between keyframe refreshes (changed shards only)
+WORLD_TTL = 30                # Keyframes of a bridge that went away expire
+CACHE_SECONDS = 0.1           # Per-worker cache: a reconnect storm costs one HGETALL per window
+SOURCE_TIMEOUT = 15.0         # A publisher silent this long is gone (live ones keyframe every 5s)
+
+
+class WorldBuilder:
+    """
+    One FrameMirror per publisher (source), grouped by shard (bridge side).
+    apply() is fed every frame in arrival order. The keyframes carry each
+    publisher's own source id, dictionary and seq, so a client seeded with
+    them decodes the live deltas that follow.
+    """
+
+    def __init__(self):
+        self.mirrors = {}
+        self.shards = {} # source -> shard
+        self.seen = {}   # source -> monotonic time of its last frame
+        self.dirty = set()
+
+    def apply(self, shard, binary_data):
+        source = frame_source(binary_data)
+        mirror = self.mirrors.get(source)
+        if mirror is None:
+            mirror = self.mirrors[source] = FrameMirror(source)
+        mirror.apply(binary_data)
+        self.shards[source] = shard
+        self.seen[source] = time.monotonic()
+        self.dirty.add(shard)
+
+    def keyframe(self, source):
+        """Current keyframe of one publisher (None until its mirror is synced)."""
+        mirror = self.mirrors.get(source)
+        return mirror.keyframe() if mirror is not None else None
+
+    def keyframes(self):
+        """
+        [(shard, packed keyframe list)] for every shard changed since the last
+        call. Oldest publisher first, so the newest state is applied last.
+        """
+        now = time.monotonic()
+        for source, seen in list(self.seen.items()):
+            if now - seen > SOURCE_TIMEOUT:
+                self.dirty.add(self.shards.pop(source))
+                del self.mirrors[source], self.seen[source]
+
+        frames = []
+        for shard in sorted(self.dirty):
+            mirrors = sorted(
+                (m for source, m in self.mirrors.items() if self.shards[source] == shard and m.synced),
+                key=lambda mirror: mirror.t,
+            )
+            frames.append((shard, msgpack.packb([mirror.keyframe() for mirror in mirrors])))
+        self.dirty.clear()
+        return frames
+
+
+def queue_store(pipe, frames):
+    """Queues the HSET of fresh keyframes (plus the TTL refresh) on a pipeline."""
+    if frames:
+        pipe.hset(WORLD_KEY, mapping={shard: packed for shard, packed in frames})
+        pipe.expire(WORLD_KEY, WORLD_TTL)
+
+
+class KeyframeCache:
+    """
+    Per-worker copy of the WORLD_KEY hash, refreshed at most every
+    CACHE_SECONDS. Concurrent callers on one event loop share a single
+    in-flight read.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        self.fetched_at = None
+        self._inflight = weakref.WeakKeyDictionary()
+
+    async def get(self, r, shards):
+        """Keyframes of the given shards (every publisher's), in shard order."""
+        if self.fetched_at is None or time.monotonic() - self.fetched_at >= CACHE_SECONDS:
+            loop = asyncio.get_running_loop()
+            refresh = self._inflight.get(loop)
+            if refresh is None:
+                refresh = self._inflight[loop] = asyncio.ensure_future(self._refresh(r, loop))
+            await asyncio.shield(refresh)
+        return [frame for shard in sorted(shards) for frame in self.frames.get(shard, ())]
+
+    async def _refresh(self, r, loop):
+        try:
+            raw = await r.hgetall(WORLD_KEY)
+            self.frames = {int(shard): msgpack.unpackb(packed) for shard, packed in raw.items()}
+            self.fetched_at = time.monotonic()
+        finally:
+            self._inflight.pop(loop, None)
+
+
+keyframe_cache = KeyframeCache()
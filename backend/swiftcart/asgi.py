@@ -7,10 +7,13 @@ For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 
+import asyncio
 import os
+import sys
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from physics.interactions import close_interaction_buffer
 from physics.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'swiftcart.settings')
@@ -19,7 +22,34 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'swiftcart.settings')
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
+
+async def lifespan(scope, receive, send):
+    """ASGI lifespan: flushes this worker's buffered interactions before it exits."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_interaction_buffer()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def flush_on_reactor_shutdown():
+    """Daphne sends no lifespan events: run the same flush from its Twisted reactor's shutdown."""
+    if 'twisted.internet.reactor' not in sys.modules:
+        return # Not under Daphne; importing the reactor here would install the wrong one
+    from twisted.internet import defer, reactor
+    reactor.addSystemEventTrigger(
+        'before', 'shutdown',
+        lambda: defer.Deferred.fromFuture(asyncio.ensure_future(close_interaction_buffer())),
+    )
+
+
+flush_on_reactor_shutdown()
+
 application = ProtocolTypeRouter({
+    "lifespan": lifespan,
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
@@ -95,6 +95,20 @@ function initPhysics() {
     };
 }
 
+// Downsampled pulses: project the last remote state forward with its velocity
+// (units/s) between frames, but never further than this
+const MAX_EXTRAPOLATION_MS = 250;
+
+function extrapolatedTarget(body: any, time: number) {
+    const target = body.remoteTarget;
+    if (!body.remoteVel || body.remoteAt === undefined) return target;
+    const ahead = Math.min(time - body.remoteAt, MAX_EXTRAPOLATION_MS) / 1000;
+    return {
+        x: target.x + body.remoteVel.x * ahead,
+        y: target.y + body.remoteVel.y * ahead
+    };
+}
+
 /**
  * Main physics loop running at 60 FPS
  */
@@ -125,7 +139,7 @@ function loop(time: number) {
             // If we have remote state, we nudge the body towards it smoothly
             // rather than snapping. This ensures 60 FPS smoothness even with jitter.
             if ((body as any).remoteTarget) {
-                const target = (body as any).remoteTarget;
+                const target = extrapolatedTarget(body as any, time);
                 const lerpFactor = 0.1; // 10% towards target per frame
 
                 Matter.Body.setPosition(body, {
@@ -319,6 +333,8 @@ self.onmessage = (event: MessageEvent) => {
             if (targetBody) {
                 // Set the remote target for interpolation in the loop
                 (targetBody as any).remoteTarget = payload.pos;
+                (targetBody as any).remoteVel = payload.vel;
+                (targetBody as any).remoteAt = performance.now();
 
                 // [COMMUNAL MASS] Update mass and scale
                 if (payload.mass && payload.mass !== targetBody.mass) {
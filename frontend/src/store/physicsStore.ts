@@ -1,5 +1,8 @@
 import { create } from 'zustand';
-import { encode, decode } from '@msgpack/msgpack';
+import { decode } from '@msgpack/msgpack';
+import { AnchorSync } from '../utils/snapshot-sync';
+
+const anchorSync = new AnchorSync();
 
 interface BodyState {
     id: number;
@@ -127,16 +130,22 @@ export const usePhysicsStore = create<PhysicsStore>((set, get) => ({
         }));
 
         try {
-            const packed = encode(snapshot);
-            await fetch('http://localhost:8000/api/physics/snapshot/handshake/', {
+            const upload = await anchorSync.buildUpload(snapshot);
+            if (!upload) return; // Anchor already current
+
+            const response = await fetch('http://localhost:8000/api/physics/snapshot/handshake/', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/x-msgpack',
-                    'X-Session-ID': 'sc_session_001'
-                },
-                body: packed
+                headers: { ...upload.headers, 'X-Session-ID': 'sc_session_001' },
+                body: upload.body
             });
-            console.log('[Snapshot] Binary Anchor saved.');
+            if (response.ok) {
+                const { version } = await response.json();
+                anchorSync.ack(version, upload);
+                console.log('[Snapshot] Binary Anchor saved.');
+            } else {
+                // Stale base (409) or rejected patch: next sync sends a full anchor
+                anchorSync.reset();
+            }
         } catch (err) {
             console.error('[Snapshot] Failed to anchor:', err);
         }
@@ -21,3 +21,23 @@ export const checkPhysicsSupport = (): boolean => {
         return false;
     }
 };
+
+export type PulseTier = 'low' | 'mid' | 'high';
+
+/**
+ * Picks the pulse rate tier the server should downsample to for this device.
+ * Constrained devices (few cores, little memory, data saver) get fewer frames
+ * and extrapolate in between; desktops keep the full stream.
+ */
+export const detectPulseTier = (): PulseTier => {
+    if (typeof navigator === 'undefined') return 'high';
+    const nav = navigator as any;
+
+    if (nav.connection?.saveData) return 'low';
+
+    const cores = nav.hardwareConcurrency || 4;
+    const memory = nav.deviceMemory || 8; // GB (Chromium only)
+    if (cores <= 2 || memory <= 2) return 'low';
+    if (cores <= 4 || memory <= 4) return 'mid';
+    return 'high';
+};
@@ -0,0 +1,105 @@
+/**
+ * Binary Pulse Frame decoder (v1)
+ * Mirrors backend/physics/frames.py: one column-oriented message per tick,
+ * product IDs interned per source, delta frames carry changed fields only.
+ */
+
+export const FRAME_MAGIC = 0xC1; // Never emitted by MessagePack
+const FRAME_VERSION = 1;
+const FLAG_KEYFRAME = 0x01;
+const HEADER_SIZE = 24;
+
+type FieldSpec = { name: string; width: number; size: number; kind: 'f64' | 'f32' | 'i32' };
+
+// Field id === index in this table (keep in sync with FIELDS in frames.py)
+const FIELDS: FieldSpec[] = [
+    { name: 'p', width: 1, size: 8, kind: 'f64' },
+    { name: 'm', width: 1, size: 4, kind: 'f32' },
+    { name: 'ins', width: 1, size: 4, kind: 'f32' },
+    { name: 'stk', width: 1, size: 4, kind: 'i32' },
+    { name: 'pos', width: 2, size: 4, kind: 'f32' },
+    { name: 'vel', width: 2, size: 4, kind: 'f32' },
+    { name: 'hits', width: 1, size: 4, kind: 'i32' },
+];
+
+export interface PulseFrame {
+    source: number;
+    seq: number;
+    t: number;
+    keyframe: boolean;
+    updates: Map<string, Record<string, any>>;
+}
+
+const textDecoder = new TextDecoder();
+
+export const isPulseFrame = (buffer: ArrayBuffer): boolean =>
+    buffer.byteLength > 0 && new Uint8Array(buffer, 0, 1)[0] === FRAME_MAGIC;
+
+export class PulseFrameDecoder {
+    // source -> (index -> product id)
+    private dictionaries = new Map<number, Map<number, string>>();
+
+    public decode(buffer: ArrayBuffer): PulseFrame {
+        const view = new DataView(buffer);
+        const bytes = new Uint8Array(buffer);
+
+        const version = view.getUint8(1);
+        if (view.getUint8(0) !== FRAME_MAGIC || version !== FRAME_VERSION) {
+            throw new Error(`Unsupported pulse frame version ${version}`);
+        }
+        const flags = view.getUint8(2);
+        const nblocks = view.getUint8(3);
+        const source = view.getUint32(4, true);
+        const seq = view.getUint32(8, true);
+        const t = view.getFloat64(12, true);
+        const ndict = view.getUint32(20, true);
+
+        let names = this.dictionaries.get(source);
+        if (!names) {
+            names = new Map();
+            this.dictionaries.set(source, names);
+        }
+
+        let offset = HEADER_SIZE;
+        for (let i = 0; i < ndict; i++) {
+            const idx = view.getUint32(offset, true);
+            const length = view.getUint8(offset + 4);
+            offset += 5;
+            names.set(idx, textDecoder.decode(bytes.subarray(offset, offset + length)));
+            offset += length;
+        }
+
+        const updates = new Map<string, Record<string, any>>();
+        for (let b = 0; b < nblocks; b++) {
+            const field = FIELDS[view.getUint8(offset)];
+            const count = view.getUint32(offset + 1, true);
+            offset += 5;
+
+            const indexOffset = offset;
+            offset += count * 4;
+
+            for (let i = 0; i < count; i++) {
+                const pid = names.get(view.getUint32(indexOffset + i * 4, true));
+                const base = offset + i * field.width * field.size;
+                if (pid === undefined) continue;
+
+                const read = (at: number) =>
+                    field.kind === 'f64' ? view.getFloat64(at, true)
+                        : field.kind === 'f32' ? view.getFloat32(at, true)
+                            : view.getInt32(at, true);
+
+                let entry = updates.get(pid);
+                if (!entry) {
+                    entry = {};
+                    updates.set(pid, entry);
+                }
+                entry[field.name] = field.width === 2
+                    ? { x: read(base), y: read(base + field.size) }
+                    : read(base);
+            }
+            offset += count * field.width * field.size;
+        }
+
+        return { source, seq, t, keyframe: (flags & FLAG_KEYFRAME) !== 0, updates };
+    }
+}
@@ -1,5 +1,7 @@
 import { decode } from '@msgpack/msgpack';
 import { usePhysicsStore } from '../store/physicsStore';
+import { PulseFrameDecoder, isPulseFrame } from './pulse-frame';
+import { detectPulseTier } from './capabilityDetection';
 
 /**
  * PulseReceiver manages the binary WebSocket connection for price updates.
@@ -12,6 +14,11 @@ class PulseReceiver {
     private maxReconnectTimeout: number = 30000; // 30s max
     private baseReconnectTimeout: number = 1000; // 1s start
     private isPaused: boolean = false; // [EPIC 5] Paradox Pause
+    private retryAfter: number | null = null; // Server-suggested delay when it sheds load
+    private frameDecoder = new PulseFrameDecoder();
+    private tier = detectPulseTier(); // Server downsamples the stream to this tier's rate
+    // Last known state per product (binary frames only carry changed fields)
+    private orbState = new Map<string, Record<string, any>>();
 
     constructor(url: string = 'ws://localhost:8000/ws/pulse/') {
         this.url = url;
@@ -28,7 +35,7 @@ class PulseReceiver {
 
         // Simplified JWT token for implementation demo
         const token = 'orbital_sync_token_v1';
-        this.socket = new WebSocket(`${this.url}?token=${token}`);
+        this.socket = new WebSocket(`${this.url}?token=${token}&tier=${this.tier}`);
         this.socket.binaryType = 'arraybuffer';
 
         this.socket.onopen = () => {
@@ -38,6 +45,19 @@ class PulseReceiver {
 
         this.socket.onmessage = (event: MessageEvent) => {
             try {
+                // Binary pulse frame: every changed product of a tick in one message
+                if (isPulseFrame(event.data)) {
+                    this.applyFrame(event.data);
+                    return;
+                }
+
+                // Overloaded worker: it closes right after, come back later
+                if (typeof event.data === 'string') {
+                    const message = JSON.parse(event.data);
+                    if (message.type === 'RETRY') this.retryAfter = message.after_ms;
+                    return;
+                }
+
                 // Decode binary MessagePack data
                 const decoded = decode(event.data) as any;
 
@@ -102,10 +122,12 @@ class PulseReceiver {
             this.reconnectAttempts++;
 
             // Exponential Backoff: base * 2^attempts (capped)
-            const delay = Math.min(
+            // (never sooner than the server asked for)
+            const delay = Math.max(Math.min(
                 this.baseReconnectTimeout * Math.pow(2, this.reconnectAttempts),
                 this.maxReconnectTimeout
-            );
+            ), this.retryAfter || 0);
+            this.retryAfter = null;
 
             console.warn(`[PulseReceiver] Pulse dead. Reconnecting in ${delay}ms (Attempt ${this.reconnectAttempts})...`);
             setTimeout(() => this.connect(), delay);
@@ -116,6 +138,32 @@ class PulseReceiver {
         };
     }
 
+    private applyFrame(buffer: ArrayBuffer) {
+        const frame = this.frameDecoder.decode(buffer);
+        const store = usePhysicsStore.getState();
+
+        frame.updates.forEach((update, id) => {
+            const state = { ...(this.orbState.get(id) || {}), ...update };
+            this.orbState.set(id, state);
+
+            if (update.p !== undefined) {
+                store.updatePrice(id, update.p);
+            }
+
+            window.dispatchEvent(new CustomEvent('pulse_sync', {
+                detail: {
+                    id,
+                    pos: state.pos,
+                    vel: state.vel,
+                    t: frame.t, // Server time of this state (extrapolation base)
+                    mass: state.m || 1.0,
+                    instability: state.ins || 0,
+                    stock: state.stk !== undefined ? state.stk : 100
+                }
+            }));
+        });
+    }
+
     public pause() {
         console.warn('[PulseReceiver] Pausing stream due to Temporal Paradox.');
         this.isPaused = true;
@@ -139,6 +187,15 @@ class PulseReceiver {
         }
     }
 
+    /**
+     * Re-negotiates the pulse rate on a live socket (e.g. when the tab is
+     * throttled or the user toggles a low-power mode).
+     */
+    public setRate(hz: number | null, tier = this.tier) {
+        this.tier = tier;
+        this.send({ type: 'HELLO', hz, tier });
+    }
+
     public send(data: any) {
         if (this.socket && this.socket.readyState === WebSocket.OPEN) {
             this.socket.send(JSON.stringify(data));
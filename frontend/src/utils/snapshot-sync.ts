@@ -0,0 +1,76 @@
+import { encode } from '@msgpack/msgpack';
+
+/**
+ * [STORY 5.3] Delta Anchors
+ * Remembers the last anchor the server acknowledged and uploads only the
+ * bodies that changed since (plus removed ids), deflate-compressed when the
+ * browser supports CompressionStream. Falls back to a full anchor whenever
+ * the server reports a version conflict.
+ */
+
+export interface AnchorBody {
+    id: number;
+    pId: string;
+    pos: { x: number; y: number };
+    rot: number;
+    price: number;
+}
+
+export interface AnchorUpload {
+    body: Uint8Array;
+    headers: Record<string, string>;
+    bodies: Record<number, string>;
+}
+
+// Above this share of changed bodies a full anchor is cheaper than a patch
+const FULL_ANCHOR_RATIO = 0.6;
+
+async function deflate(data: Uint8Array): Promise<Uint8Array | null> {
+    if (typeof CompressionStream === 'undefined') return null;
+    const stream = new Blob([data]).stream().pipeThrough(new CompressionStream('deflate'));
+    return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+export class AnchorSync {
+    private version = 0;
+    private acked: Record<number, string> = {}; // id -> serialized body at `version`
+
+    async buildUpload(snapshot: AnchorBody[]): Promise<AnchorUpload | null> {
+        const bodies: Record<number, string> = {};
+        const upsert: AnchorBody[] = [];
+        snapshot.forEach(body => {
+            const serialized = JSON.stringify(body);
+            bodies[body.id] = serialized;
+            if (this.acked[body.id] !== serialized) upsert.push(body);
+        });
+        const remove = Object.keys(this.acked).map(Number).filter(id => !(id in bodies));
+
+        const headers: Record<string, string> = { 'Content-Type': 'application/x-msgpack' };
+        let payload: unknown;
+        if (this.version && upsert.length <= snapshot.length * FULL_ANCHOR_RATIO) {
+            if (!upsert.length && !remove.length) return null; // Nothing moved
+            payload = { upsert, remove };
+            headers['X-Snapshot-Base'] = String(this.version);
+        } else {
+            payload = snapshot;
+        }
+
+        let body = encode(payload);
+        const compressed = await deflate(body);
+        if (compressed && compressed.length < body.length) {
+            body = compressed;
+            headers['Content-Encoding'] = 'deflate';
+        }
+        return { body, headers, bodies };
+    }
+
+    ack(version: number, upload: AnchorUpload) {
+        this.version = version;
+        this.acked = upload.bodies;
+    }
+
+    reset() {
+        this.version = 0;
+        this.acked = {};
+    }
+}